@@ -0,0 +1,228 @@
+#--------------------------------------------------------------------------#
+# Imports
+#--------------------------------------------------------------------------#
+from flask import (
+    Blueprint,
+    Response,
+    request,
+    current_app,
+    abort,
+    stream_with_context
+)
+from werkzeug.exceptions import HTTPException
+
+# Import model and view helpers
+from models import *
+from pagination import after_cursor, decode_cursor, fetch_page, parse_limit
+from conditional import Validators
+from routing import read_only
+from facets import requested_genre, filter_genre
+from matchmaking import recommendations
+from cache import cache, artist_key, venue_key, details_ttl
+from artist.artist import artist_details, artist_version
+from venue.venue import venue_details, venue_version, near_args, near_results
+from show.show import shows_page
+from pool import pool_stats
+from instrumentation import endpoint_stats
+from export import ARTIST_FIELDS, VENUE_FIELDS, EXPORTS, FORMATS, dumps, export_chunks
+
+
+# Create an api blueprint object
+api_bp = Blueprint('api_bp', __name__, url_prefix='/api/v1')
+
+
+# JSON helpers
+#--------------------------------------------------------------------------#
+def json_response(payload, status=200):
+    return Response(dumps(payload), status=status, mimetype='application/json')
+
+
+# Fields requested with ?fields=a,b / None when all fields are wanted
+def requested_fields():
+    value = request.args.get('fields')
+    if not value:
+        return None
+    return {field.strip() for field in value.split(',') if field.strip()}
+
+
+def select_fields(item, fields):
+    if fields is None:
+        return item
+    return {key: value for key, value in item.items() if key in fields}
+
+
+def page_limit():
+    return parse_limit(request.args.get('limit'),
+      current_app.config.get('API_PAGE_SIZE', 50),
+      current_app.config.get('API_MAX_PAGE_SIZE', 500))
+
+
+def match_limit():
+    return parse_limit(request.args.get('limit'),
+      current_app.config.get('MATCH_RESULT_LIMIT', 10),
+      current_app.config.get('API_MAX_PAGE_SIZE', 500))
+
+
+# The app's own 404/500 handlers render HTML and, being registered by
+# code, would win over a class handler / register the codes here too
+@api_bp.errorhandler(404)
+@api_bp.errorhandler(500)
+@api_bp.errorhandler(HTTPException)
+def api_error(error):
+    return json_response({'error': error.name, 'status': error.code}, error.code)
+
+
+# Generic list of a model paged by id / loads only the selected columns,
+# of one genre with ?genre=
+#--------------------------------------------------------------------------#
+def list_entities(model, columns):
+    fields = requested_fields()
+    selected = [name for name in columns if fields is None or name in fields]
+    if 'id' not in selected:
+        selected.insert(0, 'id')
+
+    query = db.session.query(*[columns[name].label(name) for name in selected])\
+      .order_by(model.id)
+    query = filter_genre(query, model, requested_genre())
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            query = after_cursor(query, (model.id,), decode_cursor(cursor, int))
+        except ValueError:
+            return json_response({'error': 'Invalid cursor', 'status': 400}, 400)
+
+    rows, next_cursor = fetch_page(query, page_limit(), lambda row: (row.id,))
+    data = [select_fields(dict(row._mapping), fields) for row in rows]
+    return json_response({'data': data, 'next_cursor': next_cursor})
+
+
+# Detail of one entity / same dict (and cache entry) as the HTML page
+def entity_detail(version, details, key, kind, entity_id):
+    updated_at, last_past_show = version(entity_id)
+    validators = Validators((kind, 'api', entity_id, updated_at, last_past_show), updated_at)
+    if validators.fresh:
+        return validators.not_modified()
+
+    data = cache.get(key(entity_id))
+    if data is None:
+        data = details(entity_id)
+        cache.set(key(entity_id), data, details_ttl(data))
+
+    return validators.apply(json_response({'data': select_fields(data, requested_fields())}))
+
+
+# Artists
+#--------------------------------------------------------------------------#
+@api_bp.route('/artists')
+@read_only
+def list_artists():
+    return list_entities(Artist, ARTIST_FIELDS)
+
+
+@api_bp.route('/artists/<int:artist_id>')
+@read_only
+def get_artist(artist_id):
+    return entity_detail(artist_version, artist_details, artist_key, 'artist', artist_id)
+
+
+@api_bp.route('/artists/<int:artist_id>/recommendations')
+@read_only
+def artist_recommendations(artist_id):
+    artist = Artist.query.options(*strict_loading()).get_or_404(artist_id)
+    return json_response({'data': recommendations(artist, match_limit())})
+
+
+# Venues
+#--------------------------------------------------------------------------#
+@api_bp.route('/venues')
+@read_only
+def list_venues():
+    return list_entities(Venue, VENUE_FIELDS)
+
+
+# Nearest venues, or the venues within ?radius=km / ?lat=..&lon=.. or ?city=..&state=..
+@api_bp.route('/venues/near')
+@read_only
+def near_venues():
+    latitude, longitude, radius = near_args()
+    if latitude is None:
+        abort(400)
+    data = [{
+        'id': venue.id,
+        'name': venue.name,
+        'city': venue.city,
+        'state': venue.state,
+        'latitude': venue.latitude,
+        'longitude': venue.longitude,
+        'distance_km': round(distance, 3),
+    } for distance, venue in near_results(latitude, longitude, radius, page_limit())]
+    return json_response({'data': data})
+
+
+@api_bp.route('/venues/<int:venue_id>')
+@read_only
+def get_venue(venue_id):
+    return entity_detail(venue_version, venue_details, venue_key, 'venue', venue_id)
+
+
+@api_bp.route('/venues/<int:venue_id>/recommendations')
+@read_only
+def venue_recommendations(venue_id):
+    venue = Venue.query.options(*strict_loading()).get_or_404(venue_id)
+    return json_response({'data': recommendations(venue, match_limit())})
+
+
+# Shows / same query as the /shows page, with the optional start / end window
+#--------------------------------------------------------------------------#
+@api_bp.route('/shows')
+@read_only
+def list_shows():
+    fields = requested_fields()
+    rows, next_cursor = shows_page(page_limit())
+    data = [select_fields({
+        'id': row.id,
+        'artist_id': row.artist_id,
+        'artist_name': row.artist_name,
+        'artist_image_link': row.artist_image_link,
+        'venue_id': row.venue_id,
+        'venue_name': row.venue_name,
+        'start_time': row.start_time,
+        'end_time': row.end_time,
+    }, fields) for row in rows]
+    return json_response({'data': data, 'next_cursor': next_cursor})
+
+
+# Streaming exports / /api/v1/export/shows.ndjson, /api/v1/export/artists.csv
+# Whole tables, so off unless EXPORT_ENDPOINT is set ('flask export' always works)
+#--------------------------------------------------------------------------#
+@api_bp.route('/export/<kind>.<file_format>')
+@read_only
+def export(kind, file_format):
+    if not current_app.config.get('EXPORT_ENDPOINT', False):
+        abort(404)
+    if kind not in EXPORTS or file_format not in FORMATS:
+        abort(404)
+
+    # The first bytes are sent as soon as the first chunk is encoded
+    response = Response(stream_with_context(export_chunks(kind, file_format)),
+      mimetype=FORMATS[file_format])
+    response.headers['Content-Disposition'] = f'attachment; filename={kind}.{file_format}'
+    return response
+
+
+# Connection pool of this worker / off unless DB_POOL_STATS_ENDPOINT is set
+#--------------------------------------------------------------------------#
+@api_bp.route('/pool')
+def pool():
+    if not current_app.config.get('DB_POOL_STATS_ENDPOINT', False):
+        abort(404)
+    return json_response(pool_stats(db.engine))
+
+
+# Queries and database time per endpoint of this worker
+@api_bp.route('/sql')
+def sql():
+    if not current_app.config.get('SQL_STATS_ENDPOINT', False):
+        abort(404)
+    return json_response(endpoint_stats.snapshot())
@@ -1,82 +1,114 @@
 #--------------------------------------------------------------------------#
 # Imports
 #--------------------------------------------------------------------------#
-from flask_migrate import Migrate
-from flask_moment import Moment
-from babel import Locale
+from collections.abc import Mapping
+import click
 from flask import Flask, render_template
-import logging
-from logging import Formatter, FileHandler
-import dateutil.parser
-from datetime import datetime
-import babel
+from flask_moment import Moment
 
 # Import user defined module
-from models import *
+from models import db
+from search import search_engine
+from cache import cache
+from templating import init_templates
+from pool import init_pool, init_statement_timeout
+from routing import init_routing
+from instrumentation import init_instrumentation
+from logs import init_logging
+
 
-# Import blueprints
-from artist.artist import artist_bp
-from venue.venue import venue_bp
-from show.show import show_bp
-from general.general import general_bp
+moment = Moment()
 
 
-# Config app to the database
+# Application factory
+#
+# config is an import path or object for app.config.from_object, or a
+# mapping of settings. The schema is not created here: run
+# 'flask db upgrade' (see migrations/).
 #--------------------------------------------------------------------------#
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-
-# Initialiaze app
-db.init_app(app)
-with app.app_context():
-    db.create_all()
-#migrate = Migrate(app, db)
-
-# Register the blueprint on app
-app.register_blueprint(general_bp)
-app.register_blueprint(artist_bp)
-app.register_blueprint(venue_bp)
-app.register_blueprint(show_bp)
-
-# Filters.
-#----------------------------------------------------------------------------#
-
-# Format date and time
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
-
-app.jinja_env.filters['datetime'] = format_datetime
-
-# Convert string with specific format to datetime / used to compare datetime to get upcoming shows
-def str_to_datetime(date):
-    return datetime.strptime(date, '%Y-%m-%d %H:%M:%S')
+def create_app(config='config'):
+    app = Flask(__name__)
+    if isinstance(config, Mapping):
+        app.config.from_mapping(config)
+    else:
+        app.config.from_object(config)
+
+    # Initialiaze app / pool options and replica binds must be set before
+    # the engines exist
+    init_pool(app)
+    init_routing(app)
+    db.init_app(app)
+    init_statement_timeout(app)
+    moment.init_app(app)
+    search_engine.init_app(app)
+    cache.init_app(app)
+
+    # Request ids, and JSON log lines written by a background thread
+    # (production only)
+    init_logging(app)
+
+    # Query count, database time and N+1 detection for every request
+    init_instrumentation(app)
+
+    # Flask-Migrate imports alembic, which is only needed by the 'flask db'
+    # commands / skip it when the app is served by a WSGI server
+    if click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    register_blueprints(app)
+    register_commands(app)
+
+    # Filters and template setup (bytecode cache, precompilation)
+    init_templates(app)
+
+    register_error_handlers(app)
+    return app
+
+
+# Register the blueprints on app
+#--------------------------------------------------------------------------#
+def register_blueprints(app):
+    from general.general import general_bp
+    from artist.artist import artist_bp
+    from venue.venue import venue_bp
+    from show.show import show_bp
+    from api.api import api_bp
+
+    app.register_blueprint(general_bp)
+    app.register_blueprint(artist_bp)
+    app.register_blueprint(venue_bp)
+    app.register_blueprint(show_bp)
+    app.register_blueprint(api_bp)
+
+
+# Register the command line tools / flask explain, counters, import, export, geo
+#--------------------------------------------------------------------------#
+def register_commands(app):
+    from commands.explain import explain_command
+    from commands.counters import counters_cli
+    from commands.importer import import_command
+    from commands.exporter import export_command
+    from commands.geo import geo_cli
+
+    app.cli.add_command(explain_command)
+    app.cli.add_command(counters_cli)
+    app.cli.add_command(import_command)
+    app.cli.add_command(export_command)
+    app.cli.add_command(geo_cli)
+
 
 # Error handler
 #--------------------------------------------------------------------------#
-@app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
-@app.errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
-
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+def register_error_handlers(app):
+    app.register_error_handler(404, not_found_error)
+    app.register_error_handler(500, server_error)
 
 
 # Launch app
@@ -84,11 +116,11 @@ if not app.debug:
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
@@ -9,7 +9,8 @@ from flask import (
     Response, 
     flash, 
     redirect, 
-    url_for
+    url_for,
+    abort
 )
 from sqlalchemy import desc
 from flask_wtf import FlaskForm
@@ -17,6 +18,14 @@ from flask_wtf import FlaskForm
 # Import model and forms module
 from models import *
 from form_validate.forms import *
+from search import search_engine
+from conditional import Validators
+from routing import read_only
+from facets import requested_genre, filter_genre, listing_version, genre_facets
+from matchmaking import recommendations
+from feed import invalidate_feed
+from counters import forget_shows
+from cache import cache, artist_key, details_ttl, invalidate_artist, venues_of_artist
 
 
 # Create a artist blueprint object
@@ -55,6 +64,9 @@ def create_artist_submission():
     db.session.add(newArtist)
     db.session.commit()
 
+    # The home page lists the newest artists
+    invalidate_feed()
+
     # Display success message when new venue is added to the database
     flash('Artist ' + request.form['name'] + ' was successfully listed!')
 
@@ -75,11 +87,22 @@ def create_artist_submission():
 # List the artists added
 #---------------------------------------------------------------------------#
 @artist_bp.route('/artists')
+@read_only
 def artists():
   
   data = []
+  genre = requested_genre()
+
+  # Answer with 304 when the list has not changed since the client's copy
+  version = listing_version(Artist)
+  last_update, count = version
+  validators = Validators(('artists', genre, last_update, count), last_update)
+  if validators.fresh:
+    return validators.not_modified()
   
-  artists = Artist.query.all()
+  # Only the columns rendered by the page / of one genre with ?genre=
+  query = db.session.query(Artist.id, Artist.name, Artist.upcoming_shows_count)
+  artists = filter_genre(query, Artist, genre).all()
 
   #Loop through the artists list
   for artist in artists:
@@ -87,29 +110,40 @@ def artists():
     #Add the artists details to the data list
     data.append({
       "id": artist.id,
-      "name": artist.name
+      "name": artist.name,
+      "num_upcoming_shows": artist.upcoming_shows_count
     })
   
   #Redirect user to artist page
-  return render_template('pages/artists.html', artists=data)
+  return validators.apply(render_template('pages/artists.html', artists=data,
+    facets=genre_facets(Artist, version, genre)))
 
 # Search artists
 #---------------------------------------------------------------------------#
 
 @artist_bp.route('/artists/search', methods=['POST'])
+@read_only
 def search_artists():
   
   data=[]
   
   #Define word used for search
   search_word = request.form['search_term']
+  genre = requested_genre()
+
+  #Ranked ids of the best matching artists (name, city, state or genre)
+  ranked_ids = search_engine.search(Artist, search_word, genre=genre)
 
-  #Artist search results
-  results = Artist.query.filter(Artist.name.ilike(f'%{search_word}%')).all()
+  #Load the matches with their show counter in one query / keep the ranking order
+  rows = db.session.query(Artist.id, Artist.name, Artist.upcoming_shows_count)\
+    .filter(Artist.id.in_(ranked_ids)).all()
+  matches = {row.id: row for row in rows}
+  results = [matches[artist_id] for artist_id in ranked_ids if artist_id in matches]
 
   #Loop through the results to get artist match
   for result in results:
-    data.append({"id":result.id, "name":result.name, "num_upcoming_shows":0})
+    data.append({"id":result.id, "name":result.name,
+      "num_upcoming_shows":result.upcoming_shows_count})
 
   #Create a response to display with search results
   response = {
@@ -119,40 +153,35 @@ def search_artists():
 
   # Redirect to the search page
   return render_template('pages/search_artists.html', 
-    results=response, search_term=request.form.get('search_term', ''))
+    results=response, search_term=request.form.get('search_term', ''),
+    facets=genre_facets(Artist, listing_version(Artist), genre))
 
 
 # Show details of the selected artist
 #-----------------------------------------------------------------------------#
-@artist_bp.route('/artists/<int:artist_id>')
-def show_artist(artist_id):
+# Assemble the data of the artist page / aborts with 404 if not found
+def artist_details(artist_id):
   
   # Get the artist object using the artist_id / if not found return an error
-  artist = Artist.query.get_or_404(artist_id)
+  artist = Artist.query.options(*strict_loading()).get_or_404(artist_id)
   
-  # Get the details of the past shows
-  past_shows_query = db.session.query(Show).join(Venue).filter(Show.artist_id==artist_id)\
-    .filter(Show.start_time < datetime.now()).all()
+  # Get the details of all the shows with their venue in one query
+  shows_query = db.session.query(Show.venue_id, Show.start_time,
+      Venue.name.label('venue_name'), Venue.image_link.label('venue_image_link'))\
+    .join(Venue, Show.venue_id == Venue.id).filter(Show.artist_id==artist_id)\
+    .order_by(Show.start_time).all()
   past_shows = []
-
-  for show in past_shows_query:
-    past_shows.append({
-      "venue_id": show.venue_id,
-      "venue_name": show.venue.name,
-      "venue_image_link": show.venue.image_link,
-      "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-    })
-  
-  # Get the details of the upcoming shows
-  upcoming_shows_query = db.session.query(Show).join(Venue).filter(Show.artist_id==artist_id)\
-    .filter(Show.start_time > datetime.now()).all()
   upcoming_shows = []
 
-  for show in upcoming_shows_query:
-    upcoming_shows.append({
+  # Split the shows into past and upcoming shows
+  now = datetime.now()
+  for show in shows_query:
+    if show.start_time == now:
+      continue
+    (past_shows if show.start_time < now else upcoming_shows).append({
       "venue_id": show.venue_id,
-      "venue_name": show.venue.name,
-      "venue_image_link": show.venue.image_link,
+      "venue_name": show.venue_name,
+      "venue_image_link": show.venue_image_link,
       "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
     })
   
@@ -175,10 +204,51 @@ def show_artist(artist_id):
     "upcoming_shows_count": len(upcoming_shows),
   }
 
+  return data
+
+
+# Version of the artist page / last write and start of the latest past show
+def artist_version(artist_id):
+
+  last_past_show = db.session.query(db.func.max(Show.start_time))\
+    .filter(Show.artist_id == Artist.id, Show.start_time < datetime.now()).scalar_subquery()
+  version = db.session.query(Artist.updated_at, last_past_show)\
+    .filter(Artist.id == artist_id).first()
+  if version is None:
+    abort(404)
+  return version
+
+
+@artist_bp.route('/artists/<int:artist_id>')
+@read_only
+def show_artist(artist_id):
+
+  # Answer with 304 before loading anything when the client's copy is current
+  updated_at, last_past_show = artist_version(artist_id)
+  validators = Validators(('artist', artist_id, updated_at, last_past_show), updated_at)
+  if validators.fresh:
+    return validators.not_modified()
+
+  # Serve the assembled page data from the cache when possible
+  data = cache.get(artist_key(artist_id))
+  if data is None:
+    data = artist_details(artist_id)
+    cache.set(artist_key(artist_id), data, details_ttl(data))
+
   # Redirect to show_artist page
-  return render_template('pages/show_artist.html', artist=data)
+  return validators.apply(render_template('pages/show_artist.html', artist=data))
     
 
+# Venues recommended to the artist
+#-----------------------------------------------------------------------------#
+@artist_bp.route('/artists/<int:artist_id>/recommendations')
+@read_only
+def artist_recommendations(artist_id):
+  artist = Artist.query.options(*strict_loading()).get_or_404(artist_id)
+  return render_template('pages/recommended_venues.html', artist=artist,
+    venues=recommendations(artist))
+
+
 #  Update artist details
 #-----------------------------------------------------------------------------#
 @artist_bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
@@ -187,7 +257,7 @@ def edit_artist(artist_id):
   form = ArtistForm()
   
   # Get the selected artist to update / return error
-  artist = Artist.query.get_or_404(artist_id)
+  artist = Artist.query.options(*strict_loading()).get_or_404(artist_id)
   
   # Redirect to edit_artist page
   return render_template('forms/edit_artist.html', form=form, artist=artist)
@@ -215,7 +285,15 @@ def edit_artist_submission(artist_id):
     artist.seeking_venue = form.seeking_venue.data
     artist.seeking_description = form.seeking_description.data
     
+    # Venue pages list the artist too
+    venue_ids = venues_of_artist(artist_id)
+    touch(Venue, venue_ids)
     db.session.commit()
+
+    # Drop the cached pages showing this artist
+    invalidate_artist(artist_id, venue_ids)
+    invalidate_feed()
+
     # Flash success message
     flash('The Artist ' + request.form['name'] + ' has been successfully updated!')
 
@@ -239,11 +317,22 @@ def delete_artist(artist_id):
   # Get the venue object to be deleted
   artist = Artist.query.get_or_404(artist_id)
 
+  # Venues whose pages list this artist
+  venue_ids = venues_of_artist(artist.id)
+
   try:
+    # Remove the artist's shows from the venue counters
+    forget_shows(Show.artist_id == artist.id)
+
     #Add venue object to db.session. 
     db.session.delete(artist) 
+    touch(Venue, venue_ids)
     db.session.commit()
 
+    # Drop the cached pages showing this artist
+    invalidate_artist(artist.id, venue_ids)
+    invalidate_feed()
+
     #display success message
     flash('Artist ' + artist.name + ' deleted successfully!')
 
@@ -0,0 +1,83 @@
+#--------------------------------------------------------------------------#
+# Benchmark worker cold start
+#
+# Starts fresh interpreters that import app.py, call create_app() and
+# serve a first request, the way a pre-fork server spawns a worker.
+# Exits with an error when the slowest boot goes over the budget.
+#
+#   python -m benchmarks.bench_boot [--runs 5] [--budget 1.0]
+#--------------------------------------------------------------------------#
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.common import make_app, reset_schema
+
+
+# Runs in the child interpreter / prints the timings as JSON
+CHILD = '''
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app({
+    'SECRET_KEY': 'benchmark',
+    'SQLALCHEMY_DATABASE_URI': sys.argv[1],
+    'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+    'TESTING': True,
+})
+created = time.perf_counter()
+status = app.test_client().get(sys.argv[2]).status_code
+served = time.perf_counter()
+print(json.dumps({
+    'import': imported - start,
+    'create_app': created - imported,
+    'first_request': served - created,
+    'total': served - start,
+    'status': status,
+    'phonenumbers': 'phonenumbers' in sys.modules,
+    'alembic': 'alembic' in sys.modules,
+}))
+'''
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+
+def boot(database_uri, path):
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD, database_uri, path],
+        cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=1.0,
+                        help='seconds allowed from interpreter start to first response')
+    parser.add_argument('--path', default='/')
+    parser.add_argument('--database', default=None)
+    args = parser.parse_args(argv)
+
+    # The schema is created once up front, as 'flask db upgrade' would
+    with tempfile.TemporaryDirectory() as folder:
+        database_uri = args.database or 'sqlite:///' + os.path.join(folder, 'boot.db')
+        reset_schema(make_app(database_uri))
+
+        print(f'{"import ms":>10} {"create ms":>10} {"request ms":>11} {"total ms":>10} status')
+        runs = [boot(database_uri, args.path) for _ in range(args.runs)]
+    for run in runs:
+        print(f'{run["import"] * 1000:>10.1f} {run["create_app"] * 1000:>10.1f} '
+              f'{run["first_request"] * 1000:>11.1f} {run["total"] * 1000:>10.1f} {run["status"]}')
+
+    worst = max(run['total'] for run in runs)
+    print(f'\nslowest boot {worst * 1000:.1f} ms, budget {args.budget * 1000:.0f} ms; '
+          f'phonenumbers loaded: {runs[-1]["phonenumbers"]}, alembic loaded: {runs[-1]["alembic"]}')
+    return 0 if worst <= args.budget else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+#--------------------------------------------------------------------------#
+# Benchmark venues near a point
+#
+# Seeds venues at random coordinates across the continental US, then times
+# radius and nearest-venue queries against a brute force distance scan.
+#
+#   python -m benchmarks.bench_geo [--rows 100000]
+#--------------------------------------------------------------------------#
+import argparse
+import random
+import sys
+import time
+
+from benchmarks.common import make_app, reset_schema
+from geo import encode_geohash, haversine_km, nearest_venues, venues_within
+from models import *
+
+
+POINTS = [('San Francisco', 37.7749, -122.4194), ('Austin', 30.2672, -97.7431),
+          ('New York', 40.7128, -74.0060), ('Nashville', 36.1627, -86.7816)]
+
+
+def seed_venues(app, rows, seed=7):
+    rng = random.Random(seed)
+    reset_schema(app)
+    with app.app_context():
+        batch = []
+        for i in range(rows):
+            latitude, longitude = rng.uniform(25, 49), rng.uniform(-124, -67)
+            batch.append({
+                'name': f'Venue {i}', 'city': 'Somewhere', 'state': 'CA',
+                'address': f'{i} Main St', 'genres': ['Jazz'],
+                'latitude': latitude, 'longitude': longitude,
+                'geohash': encode_geohash(latitude, longitude),
+            })
+            if len(batch) == 10000:
+                db.session.execute(Venue.__table__.insert(), batch)
+                batch = []
+        if batch:
+            db.session.execute(Venue.__table__.insert(), batch)
+        db.session.commit()
+
+
+def best_of(repeat, function, *args):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database', default=None)
+    args = parser.parse_args(argv)
+
+    app = make_app(args.database)
+    seed_venues(app, args.rows)
+
+    with app.app_context():
+        everything = db.session.query(Venue.id, Venue.latitude, Venue.longitude).all()
+
+        def brute_force(latitude, longitude, radius):
+            return sorted(venue.id for venue in everything
+                          if haversine_km(latitude, longitude, venue.latitude, venue.longitude) <= radius)
+
+        print(f'{"query":>28} {"results":>8} {"best ms":>9} {"brute ms":>9}')
+        for name, latitude, longitude in POINTS:
+            for radius in (10, 50):
+                elapsed, results = best_of(args.repeat, venues_within, latitude, longitude, radius)
+                brute, expected = best_of(1, brute_force, latitude, longitude, radius)
+                assert sorted(row.id for distance, row in results) == expected
+                print(f'{name + " " + str(radius) + " km":>28} {len(results):>8} '
+                      f'{elapsed * 1000:>9.2f} {brute * 1000:>9.1f}')
+            elapsed, results = best_of(args.repeat, nearest_venues, latitude, longitude, 10)
+            print(f'{name + " nearest 10":>28} {len(results):>8} {elapsed * 1000:>9.2f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+#--------------------------------------------------------------------------#
+# Benchmark artist / venue recommendations
+#
+# Seeds artists and venues with random genres, cities and seeking flags,
+# then times the recommendations of sample profiles against a scan that
+# scores every row of the other table (and checks both agree).
+#
+#   python -m benchmarks.bench_match [--rows 100000]
+#--------------------------------------------------------------------------#
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import make_app, reset_schema
+from form_validate.enums import Genre, State
+from geo import place_key
+from matchmaking import MATCH_WEIGHTS, matchmaker, other_side, recommendations
+from models import *
+
+
+GENRES = [genre.name for genre in Genre]
+STATES = [state.name for state in State]
+
+
+def seed(app, rows, seed=11):
+    rng = random.Random(seed)
+    cities = [(f'City {i}', rng.choice(STATES)) for i in range(rows // 50 or 1)]
+    reset_schema(app)
+    with app.app_context():
+        for model, seeking in ((Artist, 'seeking_venue'), (Venue, 'seeking_artist')):
+            batch = []
+            for i in range(rows):
+                city, state = rng.choice(cities)
+                row = {
+                    'name': f'{model.__name__} {i}', 'city': city, 'state': state,
+                    'genres': rng.sample(GENRES, rng.randint(1, 3)),
+                    seeking: rng.random() < 0.5,
+                }
+                if model is Venue:
+                    row['address'] = f'{i} Main St'
+                batch.append(row)
+                if len(batch) == 10000:
+                    db.session.execute(model.__table__.insert(), batch)
+                    batch = []
+            if batch:
+                db.session.execute(model.__table__.insert(), batch)
+
+        start = datetime(2020, 1, 1)
+        shows = [{'artist_id': rng.randint(1, rows), 'venue_id': rng.randint(1, rows),
+                  'start_time': start + timedelta(hours=3 * i),
+                  'end_time': start + timedelta(hours=3 * i + 2)} for i in range(rows)]
+        for offset in range(0, len(shows), 10000):
+            db.session.execute(Show.__table__.insert(), shows[offset:offset + 10000])
+        db.session.commit()
+
+
+# The same ranking from a scan of every row
+def scan(profile, limit):
+    model, own_column, other_column = other_side(profile)
+    played = {row[0] for row in db.session.query(other_column).filter(own_column == profile.id)}
+    genres = set(profile.genres or ())
+    area = (place_key(profile.city), profile.state.upper())
+    seeking = getattr(model, 'seeking_venue' if model is Artist else 'seeking_artist')
+    scored = []
+    for row in db.session.query(model.id, model.genres, model.city, model.state, seeking):
+        shared = genres.intersection(row.genres or ())
+        same_city = (place_key(row.city), row.state.upper()) == area
+        if not row[4] or not (shared or same_city):
+            continue
+        score = MATCH_WEIGHTS['genre'] * len(shared) \
+          + MATCH_WEIGHTS['city'] * same_city \
+          + MATCH_WEIGHTS['state'] * (row.state.upper() == area[1]) \
+          + MATCH_WEIGHTS['played'] * (row.id in played)
+        scored.append((-score, row.id))
+    return [(-score, row_id) for score, row_id in sorted(scored)[:limit]]
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--profiles', type=int, default=20)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--database', default=None)
+    args = parser.parse_args(argv)
+
+    app = make_app(args.database)
+    seed(app, args.rows)
+
+    with app.app_context():
+        for model in (Artist, Venue):
+            elapsed, _ = timed(matchmaker.index, model)
+            print(f'{model.__tablename__} index built in {elapsed * 1000:.0f} ms')
+
+        rng = random.Random(3)
+        print(f'{"profiles":>10} {"avg ms":>9} {"max ms":>9} {"scan ms":>9}')
+        for model in (Venue, Artist):
+            times, scans = [], []
+            for profile_id in rng.sample(range(1, args.rows + 1), args.profiles):
+                profile = db.session.get(model, profile_id)
+                elapsed, results = timed(recommendations, profile, args.limit)
+                scanned, expected = timed(scan, profile, args.limit)
+                assert [(row['score'], row['id']) for row in results] == expected
+                times.append(elapsed)
+                scans.append(scanned)
+            print(f'{model.__tablename__:>10} {sum(times) / len(times) * 1000:>9.2f} '
+                  f'{max(times) * 1000:>9.2f} {sum(scans) / len(scans) * 1000:>9.1f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
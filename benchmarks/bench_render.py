@@ -0,0 +1,91 @@
+#--------------------------------------------------------------------------#
+# Benchmark template rendering
+#
+# Times the datetime filter against the previous dateutil + babel version,
+# then renders /shows with a large page of shows.
+#
+#   python -m benchmarks.bench_render [--rows 10000]
+#--------------------------------------------------------------------------#
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from benchmarks.common import make_app, reset_schema, time_get
+from models import *
+from templating import format_cached, format_datetime
+
+
+# The filter as it was defined in app.py
+def format_datetime_dateutil(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def time_filter(function, values, format='full'):
+    start = time.perf_counter()
+    for value in values:
+        function(value, format)
+    return (time.perf_counter() - start) / len(values)
+
+
+def seed_shows(app, rows):
+    reset_schema(app)
+    start = datetime.now() + timedelta(days=1)
+    with app.app_context():
+        db.session.execute(Artist.__table__.insert(), [
+            {'name': f'Artist {i}', 'city': 'Austin', 'state': 'TX', 'genres': ['Jazz']}
+            for i in range(100)])
+        db.session.execute(Venue.__table__.insert(), [
+            {'name': f'Venue {i}', 'city': 'Austin', 'state': 'TX',
+             'address': f'{i} Main St', 'genres': ['Jazz']}
+            for i in range(100)])
+        db.session.execute(Show.__table__.insert(), [
+            {'artist_id': i % 100 + 1, 'venue_id': i % 97 + 1,
+             'start_time': start + timedelta(hours=i)}
+            for i in range(rows)])
+        db.session.commit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database', default=None)
+    args = parser.parse_args(argv)
+
+    base = datetime(2030, 1, 1, 20, 0)
+    dates = [base + timedelta(hours=i) for i in range(args.rows)]
+    strings = [str(date) for date in dates]
+
+    print(f'{"filter":>24} {"us/call":>10}')
+    print(f'{"dateutil + babel":>24} {time_filter(format_datetime_dateutil, strings) * 1e6:>10.1f}')
+    format_cached.cache_clear()
+    print(f'{"string, first call":>24} {time_filter(format_datetime, strings) * 1e6:>10.1f}')
+    format_cached.cache_clear()
+    print(f'{"datetime, first call":>24} {time_filter(format_datetime, dates) * 1e6:>10.1f}')
+    print(f'{"datetime, memoized":>24} {time_filter(format_datetime, dates) * 1e6:>10.1f}')
+
+    app = make_app(args.database)
+    app.config['SHOWS_MAX_PER_PAGE'] = args.rows
+    seed_shows(app, args.rows)
+    client = app.test_client()
+
+    path = f'/shows?limit={args.rows}'
+    start = time.perf_counter()
+    client.get(path)
+    print(f'\nfirst {path}: {(time.perf_counter() - start) * 1000:.1f} ms')
+    elapsed, queries, status = time_get(app, client, path, args.repeat)
+    print(f'best {path}: {elapsed * 1000:.1f} ms, {queries} queries, status {status}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,299 @@
+#--------------------------------------------------------------------------#
+# Benchmark every route
+#
+# Fills the database with the synthetic dataset (or uses one filled by
+# benchmarks.dataset with --reuse), then requests every blueprint route
+# through the Flask test client, or a local WSGI server with --server.
+# Reports p50/p95/p99 latency, queries per request (X-DB-Queries) and the
+# peak memory allocated by one request, and compares with a baseline:
+#
+#   python -m benchmarks.bench_routes --save-baseline baseline.json
+#   python -m benchmarks.bench_routes --baseline baseline.json
+#
+# Exits with 1 when a route got slower than the tolerance, runs more
+# queries than in the baseline, or has no case below (add one when
+# adding a route, or list it in SKIPPED).
+#--------------------------------------------------------------------------#
+import argparse
+import http.client
+import json
+import random
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import nullcontext
+from urllib.parse import quote, urlencode
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from benchmarks.common import make_app
+from benchmarks.dataset import generate
+from cache import cache
+from models import *
+
+
+# endpoint: [(label, method, path, form)] / {artist_id}, {venue_id},
+# {city} and {state} are filled from a sample of the rows for each request
+CASES = {
+    'general_bp.index': [('home', 'GET', '/', None)],
+    'artist_bp.create_artist_form': [('artist form', 'GET', '/artists/create', None)],
+    'artist_bp.artists': [
+        ('artists', 'GET', '/artists', None),
+        ('artists genre', 'GET', '/artists?genre=Jazz', None),
+    ],
+    'artist_bp.search_artists': [
+        ('search artists', 'POST', '/artists/search', {'search_term': 'blue'}),
+        ('search artists genre', 'POST', '/artists/search', {'search_term': 'blue', 'genre': 'Jazz'}),
+    ],
+    'artist_bp.show_artist': [('artist', 'GET', '/artists/{artist_id}', None)],
+    'artist_bp.artist_recommendations': [
+        ('artist matches', 'GET', '/artists/{artist_id}/recommendations', None)],
+    'artist_bp.edit_artist': [('artist edit form', 'GET', '/artists/{artist_id}/edit', None)],
+    'venue_bp.create_venue_form': [('venue form', 'GET', '/venues/create', None)],
+    'venue_bp.venues': [
+        ('venues', 'GET', '/venues', None),
+        ('venues genre', 'GET', '/venues?genre=Jazz', None),
+    ],
+    'venue_bp.search_venues': [
+        ('search venues', 'POST', '/venues/search', {'search_term': 'hall'}),
+        ('search venues genre', 'POST', '/venues/search', {'search_term': 'hall', 'genre': 'Jazz'}),
+    ],
+    'venue_bp.show_venue': [('venue', 'GET', '/venues/{venue_id}', None)],
+    'venue_bp.venue_recommendations': [
+        ('venue matches', 'GET', '/venues/{venue_id}/recommendations', None)],
+    'venue_bp.venues_near': [
+        ('venues near city', 'GET', '/venues/near?city={city}&state={state}', None),
+        ('venues near point', 'GET', '/venues/near?lat=40.71&lon=-74.0&radius=10', None),
+    ],
+    'venue_bp.edit_venue': [('venue edit form', 'GET', '/venues/{venue_id}/edit', None)],
+    'show_bp.create_shows': [('show form', 'GET', '/shows/create', None)],
+    'show_bp.shows': [
+        ('shows', 'GET', '/shows', None),
+        ('shows genre', 'GET', '/shows?genre=Jazz', None),
+    ],
+    'show_bp.calendar': [
+        ('calendar', 'GET', '/shows/calendar', None),
+        ('calendar city', 'GET', '/shows/calendar?city={city}&state={state}', None),
+    ],
+    'api_bp.list_artists': [('api artists', 'GET', '/api/v1/artists', None)],
+    'api_bp.get_artist': [('api artist', 'GET', '/api/v1/artists/{artist_id}', None)],
+    'api_bp.artist_recommendations': [
+        ('api artist matches', 'GET', '/api/v1/artists/{artist_id}/recommendations', None)],
+    'api_bp.list_venues': [('api venues', 'GET', '/api/v1/venues', None)],
+    'api_bp.near_venues': [('api venues near', 'GET', '/api/v1/venues/near?lat=40.71&lon=-74.0', None)],
+    'api_bp.get_venue': [('api venue', 'GET', '/api/v1/venues/{venue_id}', None)],
+    'api_bp.venue_recommendations': [
+        ('api venue matches', 'GET', '/api/v1/venues/{venue_id}/recommendations', None)],
+    'api_bp.list_shows': [
+        ('api shows', 'GET', '/api/v1/shows', None),
+        ('api shows genre', 'GET', '/api/v1/shows?genre=Jazz', None),
+    ],
+}
+
+# Routes not benchmarked, and why
+SKIPPED = {
+    'static': 'static files',
+    'artist_bp.create_artist_submission': 'writes',
+    'artist_bp.edit_artist_submission': 'writes',
+    'artist_bp.delete_artist': 'writes',
+    'venue_bp.create_venue_submission': 'writes',
+    'venue_bp.edit_venue_submission': 'writes',
+    'venue_bp.delete_venue': 'writes',
+    'show_bp.create_show_submission': 'writes',
+    'api_bp.export': 'streams whole tables',
+    'api_bp.pool': 'diagnostics',
+    'api_bp.sql': 'diagnostics',
+}
+
+WARMUP = 3
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+# Ids, cities and states to fill the paths with
+def sample_rows(app, count, seed):
+    rng = random.Random(seed)
+    with app.app_context():
+        artist_ids = [row.id for row in db.session.query(Artist.id)]
+        venues = db.session.query(Venue.id, Venue.city, Venue.state).all()
+    artist_ids = rng.sample(artist_ids, min(count, len(artist_ids)))
+    venues = rng.sample(venues, min(count, len(venues)))
+    return [{'artist_id': artist_id, 'venue_id': venue.id,
+             'city': quote(venue.city), 'state': quote(venue.state)}
+            for artist_id, venue in zip(artist_ids, venues)]
+
+
+#--------------------------------------------------------------------------#
+# Clients / request(method, path, form) returns (status, query count)
+#--------------------------------------------------------------------------#
+class TestClient:
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, form):
+        response = self.client.open(path, method=method, data=form)
+        response.get_data()
+        return response.status_code, int(response.headers.get('X-DB-Queries', -1))
+
+    def close(self):
+        pass
+
+
+# Keep-alive connections, no access log
+class QuietHandler(WSGIRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_request(self, *args):
+        pass
+
+
+class ServerClient:
+
+    def __init__(self, app):
+        self.server = make_server('127.0.0.1', 0, app, request_handler=QuietHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.connection = http.client.HTTPConnection('127.0.0.1', self.server.server_port)
+
+    def request(self, method, path, form):
+        body = urlencode(form) if form else None
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'} if form else {}
+        self.connection.request(method, path, body=body, headers=headers)
+        response = self.connection.getresponse()
+        response.read()
+        return response.status, int(response.getheader('X-DB-Queries', -1))
+
+    def close(self):
+        self.connection.close()
+        self.server.shutdown()
+
+
+#--------------------------------------------------------------------------#
+# Run
+#--------------------------------------------------------------------------#
+def run_case(client, method, path, form, samples, requests):
+    # Warm up the lazily built indexes and caches
+    for sample in samples[:WARMUP]:
+        client.request(method, path.format(**sample), form)
+
+    latencies, queries = [], set()
+    for i in range(requests):
+        sample = samples[i % len(samples)]
+        start = time.perf_counter()
+        status, count = client.request(method, path.format(**sample), form)
+        latencies.append(time.perf_counter() - start)
+        if status >= 400:
+            raise RuntimeError(f'{method} {path.format(**sample)} returned {status}')
+        queries.add(count)
+
+    # Peak memory allocated by one request
+    tracemalloc.start()
+    client.request(method, path.format(**samples[0]), form)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'p50': percentile(latencies, 0.50) * 1000,
+        'p95': percentile(latencies, 0.95) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+        'queries': max(queries),
+        'peak_kb': peak / 1024,
+    }
+
+
+# Labels of the cases slower or running more queries than the baseline
+def regressions(results, baseline, tolerance, floor_ms):
+    found = []
+    for label, result in results.items():
+        base = baseline.get(label)
+        if base is None:
+            continue
+        if result['p95'] > base['p95'] * (1 + tolerance) and result['p95'] - base['p95'] > floor_ms:
+            found.append(f'{label}: p95 {base["p95"]:.1f} -> {result["p95"]:.1f} ms')
+        if result['queries'] > base['queries']:
+            found.append(f'{label}: {base["queries"]} -> {result["queries"]} queries')
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--database', default=None,
+        help='SQLAlchemy URI (defaults to BENCH_DATABASE_URI or in-memory SQLite)')
+    parser.add_argument('--reuse', action='store_true',
+        help='Benchmark the data already in the database instead of generating it')
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--artists', type=int, default=10000)
+    parser.add_argument('--shows', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--requests', type=int, default=30, help='Timed requests per case')
+    parser.add_argument('--only', default=None, help='Only the cases whose label contains this')
+    parser.add_argument('--server', action='store_true', help='Go through a local WSGI server')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the page cache')
+    parser.add_argument('--baseline', default=None, help='Compare with this JSON file')
+    parser.add_argument('--save-baseline', default=None, help='Write the results to this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+        help='Allowed p95 slow down over the baseline (0.25 = 25%%)')
+    parser.add_argument('--floor-ms', type=float, default=1.0,
+        help='p95 differences under this many ms are noise')
+    args = parser.parse_args(argv)
+
+    app = make_app(args.database)
+    if not args.reuse:
+        generate(app, args.venues, args.artists, args.shows, args.seed)
+
+    # Every route needs a case or a reason to be skipped
+    missing = sorted({rule.endpoint for rule in app.url_map.iter_rules()}
+                     - set(CASES) - set(SKIPPED))
+    if missing:
+        print('No benchmark case for: ' + ', '.join(missing))
+        return 1
+
+    samples = sample_rows(app, max(args.requests, WARMUP), args.seed)
+    client = ServerClient(app) if args.server else TestClient(app)
+    results = {}
+    print(f'{"case":>24} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"queries":>8} {"peak KB":>9}')
+    try:
+        with cache.disabled() if args.no_cache else nullcontext():
+            for endpoint, cases in CASES.items():
+                for label, method, path, form in cases:
+                    if args.only and args.only not in label:
+                        continue
+                    result = results[label] = run_case(client, method, path, form, samples, args.requests)
+                    print(f'{label:>24} {result["p50"]:>8.2f} {result["p95"]:>8.2f} '
+                          f'{result["p99"]:>8.2f} {result["queries"]:>8} {result["peak_kb"]:>9.0f}')
+    finally:
+        client.close()
+
+    # ru_maxrss is in KB on Linux
+    print(f'max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB')
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as stream:
+            json.dump({'server': args.server, 'cases': results}, stream, indent=2, sort_keys=True)
+        print(f'Baseline written to {args.save_baseline}')
+
+    if args.baseline:
+        with open(args.baseline) as stream:
+            baseline = json.load(stream)
+        # Latencies through the server and the test client do not compare
+        if baseline['server'] != args.server:
+            print('The baseline was measured ' + ('through' if baseline['server'] else 'without')
+                  + ' --server, run the same way to compare')
+            return 1
+        found = regressions(results, baseline['cases'], args.tolerance, args.floor_ms)
+        for line in found:
+            print('REGRESSION ' + line)
+        if found:
+            return 1
+        print('OK: no regression against the baseline')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+#--------------------------------------------------------------------------#
+# Benchmark artist search
+#
+# Seeds artists with generated names and places, then times the search
+# backend selected by SEARCH_BACKEND for a few typical terms.
+#
+#   python -m benchmarks.bench_search [--rows 1000000]
+#--------------------------------------------------------------------------#
+import argparse
+import random
+import sys
+import time
+
+from benchmarks.common import make_app, reset_schema
+from form_validate.enums import Genre
+from models import *
+from search import search_engine
+
+
+WORDS = ['blue', 'moon', 'river', 'electric', 'velvet', 'silver', 'wild',
+         'golden', 'midnight', 'echo', 'stone', 'neon', 'crystal', 'ghost']
+PLACES = [('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX'),
+          ('Seattle', 'WA'), ('Chicago', 'IL'), ('Nashville', 'TN')]
+TERMS = ['velvet moon', 'river', 'san fran', 'Jazz', 'neon ghost 12']
+
+
+def seed_artists(app, rows, seed=7):
+    rng = random.Random(seed)
+    genres = [genre.name for genre in Genre]
+    reset_schema(app)
+    with app.app_context():
+        batch = []
+        for i in range(rows):
+            city, state = rng.choice(PLACES)
+            batch.append({
+                'name': f'{rng.choice(WORDS)} {rng.choice(WORDS)} {i}',
+                'city': city,
+                'state': state,
+                'phone': '5555555555',
+                'genres': rng.sample(genres, 2),
+            })
+            if len(batch) == 10000:
+                db.session.execute(Artist.__table__.insert(), batch)
+                batch = []
+        if batch:
+            db.session.execute(Artist.__table__.insert(), batch)
+        db.session.commit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--database', default=None)
+    args = parser.parse_args(argv)
+
+    app = make_app(args.database)
+    seed_artists(app, args.rows)
+
+    with app.app_context():
+        start = time.perf_counter()
+        search_engine.warm()
+        print(f'backend: {type(search_engine.backend).__name__}, '
+              f'warm-up {time.perf_counter() - start:.2f}s for {args.rows} rows')
+
+        print(f'{"term":>16} {"results":>8} {"best ms":>10}')
+        for term in TERMS:
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                ids = search_engine.search(Artist, term)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print(f'{term:>16} {len(ids):>8} {best * 1000:>10.2f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,63 @@
+#--------------------------------------------------------------------------#
+# Benchmark the /venues listing
+#
+# Seeds increasing numbers of venues spread over many cities and checks
+# that the page costs the same number of queries at every size.
+#
+#   python -m benchmarks.bench_venues [--sizes 10,1000,100000]
+#--------------------------------------------------------------------------#
+import argparse
+import sys
+
+from benchmarks.common import make_app, reset_schema, time_get
+from models import *
+
+
+# Insert venues spread over (size / 5) areas using a single executemany
+def seed_venues(app, size):
+    reset_schema(app)
+    areas = max(size // 5, 1)
+    rows = [{
+        'name': f'Venue {i}',
+        'city': f'City {i % areas}',
+        'state': 'CA' if i % 2 else 'NY',
+        'address': f'{i} Main St',
+        'phone': '5555555555',
+        'genres': ['Jazz'],
+    } for i in range(size)]
+    with app.app_context():
+        db.session.execute(Venue.__table__.insert(), rows)
+        db.session.commit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='10,1000,100000')
+    parser.add_argument('--database', default=None,
+        help='SQLAlchemy URI (defaults to BENCH_DATABASE_URI or in-memory SQLite)')
+    args = parser.parse_args(argv)
+
+    app = make_app(args.database)
+    client = app.test_client()
+
+    counts = set()
+    print(f'{"venues":>10} {"queries":>8} {"best ms":>10}')
+    for size in [int(size) for size in args.sizes.split(',')]:
+        seed_venues(app, size)
+        elapsed, queries, status = time_get(app, client, '/venues')
+        if status != 200:
+            print(f'/venues returned {status}')
+            return 1
+        counts.add(queries)
+        print(f'{size:>10} {queries:>8} {elapsed * 1000:>10.1f}')
+
+    # The query count must not depend on the number of venues / areas
+    if len(counts) != 1:
+        print('FAIL: query count grows with the number of venues')
+        return 1
+    print('OK: constant number of queries')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+#--------------------------------------------------------------------------#
+# Imports
+#--------------------------------------------------------------------------#
+import os
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+# Import user defined module
+from app import create_app
+from models import *
+
+
+# Benchmarks default to a throwaway SQLite database
+DEFAULT_DATABASE_URI = 'sqlite://'
+
+
+# Build the app with create_app, pointed at the benchmark database
+#--------------------------------------------------------------------------#
+def make_app(database_uri=None):
+    return create_app({
+        'SECRET_KEY': 'benchmark',
+        'SQLALCHEMY_DATABASE_URI': database_uri or os.environ.get(
+            'BENCH_DATABASE_URI', DEFAULT_DATABASE_URI),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'WTF_CSRF_ENABLED': False,
+        'TESTING': True,
+        # A page running one statement per row fails the benchmark run
+        'SQL_NPLUSONE_ACTION': 'raise',
+    })
+
+
+# Reset the schema of the benchmark database
+def reset_schema(app):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+
+# Count the statements sent to the database inside the block
+#--------------------------------------------------------------------------#
+class QueryCounter:
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+@contextmanager
+def count_queries(engine):
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
+
+
+# Time a GET request / returns (seconds, query count, status code)
+#--------------------------------------------------------------------------#
+def time_get(app, client, path, repeat=5):
+    best = None
+    with app.app_context():
+        engine = db.engine
+    for _ in range(repeat):
+        with count_queries(engine) as counter:
+            start = time.perf_counter()
+            response = client.get(path)
+            elapsed = time.perf_counter() - start
+        if best is None or elapsed < best[0]:
+            best = (elapsed, counter.count, response.status_code)
+    return best
@@ -0,0 +1,252 @@
+#--------------------------------------------------------------------------#
+# Synthetic dataset generator
+#
+# Fills the database with venues, artists and shows at a realistic scale.
+# The same seed always gives the same rows (dates are relative to the
+# anchor day, today by default):
+#
+#   * genres follow a Zipf distribution over form_validate.enums.Genre,
+#     1 to 3 per artist or venue
+#   * cities: large US cities weighted by size, then small towns in
+#     every State, with their coordinates loaded into places
+#   * phones and links pass the artist and venue forms, so an exported
+#     dataset can be imported again
+#   * shows: two slots per evening, more on Fridays and Saturdays, over
+#     the past two years and the coming year. Popular artists and venues
+#     get more shows, and no venue or artist is ever booked twice in a
+#     slot, so the booking constraints hold.
+#
+#   python -m benchmarks.dataset --venues 10000 --artists 100000 --shows 2000000
+#--------------------------------------------------------------------------#
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+
+from benchmarks.common import DEFAULT_DATABASE_URI, make_app, reset_schema
+from form_validate.enums import Genre, State
+from geo import encode_geohash, place_key
+import counters
+from models import *
+
+
+# Most played genres first / weights fall off as 1 / rank ** 0.8
+GENRE_RANKING = [
+    Genre.RocknRoll, Genre.Pop, Genre.HipHop, Genre.Alternative, Genre.Country,
+    Genre.Electronic, Genre.RnB, Genre.Jazz, Genre.Blues, Genre.Folk, Genre.Soul,
+    Genre.Punk, Genre.HeavyMetal, Genre.Funk, Genre.Reggae, Genre.Classical,
+    Genre.Instrumental, Genre.MusicalTheatre, Genre.Other,
+]
+
+# (city, state, latitude, longitude, population in thousands)
+CITIES = [
+    ('New York', 'NY', 40.7128, -74.0060, 8336), ('Los Angeles', 'CA', 34.0522, -118.2437, 3979),
+    ('Chicago', 'IL', 41.8781, -87.6298, 2693), ('Houston', 'TX', 29.7604, -95.3698, 2320),
+    ('Phoenix', 'AZ', 33.4484, -112.0740, 1680), ('Philadelphia', 'PA', 39.9526, -75.1652, 1584),
+    ('San Antonio', 'TX', 29.4241, -98.4936, 1547), ('San Diego', 'CA', 32.7157, -117.1611, 1423),
+    ('Dallas', 'TX', 32.7767, -96.7970, 1343), ('Austin', 'TX', 30.2672, -97.7431, 978),
+    ('San Francisco', 'CA', 37.7749, -122.4194, 881), ('Seattle', 'WA', 47.6062, -122.3321, 753),
+    ('Denver', 'CO', 39.7392, -104.9903, 727), ('Nashville', 'TN', 36.1627, -86.7816, 670),
+    ('Boston', 'MA', 42.3601, -71.0589, 692), ('Portland', 'OR', 45.5152, -122.6784, 654),
+    ('Las Vegas', 'NV', 36.1699, -115.1398, 651), ('Detroit', 'MI', 42.3314, -83.0458, 670),
+    ('Memphis', 'TN', 35.1495, -90.0490, 651), ('Atlanta', 'GA', 33.7490, -84.3880, 506),
+    ('Miami', 'FL', 25.7617, -80.1918, 467), ('Minneapolis', 'MN', 44.9778, -93.2650, 429),
+    ('New Orleans', 'LA', 29.9511, -90.0715, 390), ('Kansas City', 'MO', 39.0997, -94.5786, 495),
+    ('Salt Lake City', 'UT', 40.7608, -111.8910, 200), ('Asheville', 'NC', 35.5951, -82.5515, 92),
+]
+TOWNS_PER_STATE = 4
+TOWN_POPULATION = 40
+TOWN_SUFFIXES = ['Springs', 'Falls', 'Creek', 'Valley', 'Ridge']
+
+SLOT_HOURS = (19, 22)
+SHOW_MINUTES = 150
+PAST_DAYS, FUTURE_DAYS = 730, 365
+# Monday first / weekend evenings are busier
+WEEKDAY_WEIGHTS = (0.6, 0.6, 0.8, 1.0, 1.6, 1.8, 0.9)
+
+ADJECTIVES = ['Blue', 'Velvet', 'Electric', 'Golden', 'Midnight', 'Silver', 'Wild', 'Crimson',
+              'Lonesome', 'Neon', 'Hollow', 'Rolling', 'Broken', 'Quiet', 'Savage', 'Copper']
+NOUNS = ['Owls', 'Rivers', 'Wolves', 'Horizons', 'Echoes', 'Saints', 'Foxes', 'Lanterns',
+         'Pilots', 'Harbors', 'Ghosts', 'Canyons', 'Sparrows', 'Engines', 'Tides', 'Comets']
+VENUE_KINDS = ['Hall', 'Lounge', 'Club', 'Room', 'Theater', 'Tavern', 'Ballroom', 'Stage']
+
+# Valid US numbers / area codes of the cities, exchanges in use there
+AREA_CODES = ['212', '213', '312', '713', '602', '215', '210', '619', '214', '512',
+              '415', '206', '303', '615', '617', '503', '702', '313', '901', '404',
+              '305', '612', '504', '816', '801', '828']
+EXCHANGES = ['200', '234', '250', '321', '350', '412', '456', '500', '555', '650', '720', '820']
+
+BATCH = 10000
+
+
+def zipf_weights(count, exponent):
+    return [1 / (rank + 1) ** exponent for rank in range(count)]
+
+
+# k distinct items drawn with the cumulative weights / topped up uniformly
+def sample_distinct(rng, items, cum_weights, k):
+    chosen = dict.fromkeys(rng.choices(items, cum_weights=cum_weights, k=k + k // 4))
+    chosen = list(chosen)[:k]
+    if len(chosen) < k:
+        taken = set(chosen)
+        for item in rng.sample(items, min(len(items), 2 * k)):
+            if item not in taken:
+                chosen.append(item)
+                taken.add(item)
+                if len(chosen) == k:
+                    break
+    return chosen
+
+
+def phone(rng):
+    return f'{rng.choice(AREA_CODES)}{rng.choice(EXCHANGES)}{rng.randint(0, 9999):04d}'
+
+
+def links(kind, name, i):
+    slug = '-'.join(name.lower().split())
+    return {
+        'image_link': f'http://images.fyyur.example.com/{kind}/{i}.jpg',
+        'facebook_link': f'http://www.facebook.com/{slug}',
+        'website_link': f'http://{slug}.example.com',
+    }
+
+
+def cities(rng):
+    places = list(CITIES)
+    for state in State:
+        for i in range(TOWNS_PER_STATE):
+            name = f'{rng.choice(ADJECTIVES)} {rng.choice(TOWN_SUFFIXES)} {i + 1}'
+            places.append((name, state.value, rng.uniform(26, 48), rng.uniform(-123, -70),
+                           TOWN_POPULATION))
+    return places
+
+
+def genres(rng, cum_weights):
+    names = [genre.name for genre in GENRE_RANKING]
+    picked = dict.fromkeys(rng.choices(names, cum_weights=cum_weights, k=rng.choice((1, 1, 2, 2, 3))))
+    return list(picked)
+
+
+def insert(model, rows):
+    for start in range(0, len(rows), BATCH):
+        db.session.execute(model.__table__.insert(), rows[start:start + BATCH])
+
+
+def generate(app, venues=10000, artists=100000, shows=2000000, seed=42, anchor=None, echo=print):
+    rng = random.Random(seed)
+    anchor = anchor or date.today()
+    places = cities(rng)
+    city_weights = list(accumulate(place[4] for place in places))
+    genre_weights = list(accumulate(zipf_weights(len(GENRE_RANKING), 0.8)))
+    started = time.perf_counter()
+
+    reset_schema(app)
+    with app.app_context():
+        insert(Place, [{'city': city, 'state': state, 'city_key': place_key(city),
+                        'latitude': latitude, 'longitude': longitude}
+                       for city, state, latitude, longitude, population in places])
+
+        rows = []
+        for i in range(venues):
+            city, state, latitude, longitude, population = rng.choices(places, cum_weights=city_weights)[0]
+            latitude += rng.uniform(-0.08, 0.08)
+            longitude += rng.uniform(-0.08, 0.08)
+            name = f'The {rng.choice(ADJECTIVES)} {rng.choice(VENUE_KINDS)} {i}'
+            rows.append({
+                'name': name,
+                'city': city, 'state': state, 'address': f'{rng.randint(1, 9999)} Main St',
+                'phone': phone(rng),
+                'genres': genres(rng, genre_weights),
+                'seeking_artist': rng.random() < 0.4,
+                'latitude': latitude, 'longitude': longitude,
+                'geohash': encode_geohash(latitude, longitude),
+                **links('venues', name, i),
+            })
+        insert(Venue, rows)
+
+        rows = []
+        for i in range(artists):
+            city, state = rng.choices(places, cum_weights=city_weights)[0][:2]
+            name = f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}'
+            rows.append({
+                'name': name,
+                'city': city, 'state': state,
+                'phone': phone(rng),
+                'genres': genres(rng, genre_weights),
+                'seeking_venue': rng.random() < 0.3,
+                **links('artists', name, i),
+            })
+        insert(Artist, rows)
+        db.session.commit()
+        echo(f'{len(places)} places, {venues} venues, {artists} artists '
+             f'in {time.perf_counter() - started:.1f}s')
+
+        # Popular artists and venues play more often (rows are shuffled
+        # so popularity does not follow the id order)
+        venue_ids = [row.id for row in db.session.query(Venue.id).order_by(Venue.id)]
+        artist_ids = [row.id for row in db.session.query(Artist.id).order_by(Artist.id)]
+        rng.shuffle(venue_ids)
+        rng.shuffle(artist_ids)
+        venue_weights = list(accumulate(zipf_weights(len(venue_ids), 0.6)))
+        artist_weights = list(accumulate(zipf_weights(len(artist_ids), 0.9)))
+
+        # Spread the shows over the slots by weekday weight
+        first_day = anchor - timedelta(days=PAST_DAYS)
+        slots = [(first_day + timedelta(days=day), hour)
+                 for day in range(PAST_DAYS + FUTURE_DAYS) for hour in SLOT_HOURS]
+        slot_weights = [WEEKDAY_WEIGHTS[day.weekday()] for day, hour in slots]
+        total_weight = sum(slot_weights)
+        capacity = min(len(venue_ids), len(artist_ids))
+
+        written, carry, batch = 0, 0.0, []
+        for (day, hour), weight in zip(slots, slot_weights):
+            carry += shows * weight / total_weight
+            count = min(int(carry), capacity, shows - written)
+            carry -= count
+            if count <= 0:
+                continue
+            start = datetime(day.year, day.month, day.day, hour)
+            end = start + timedelta(minutes=SHOW_MINUTES)
+            for venue_id, artist_id in zip(
+                    sample_distinct(rng, venue_ids, venue_weights, count),
+                    sample_distinct(rng, artist_ids, artist_weights, count)):
+                batch.append({'venue_id': venue_id, 'artist_id': artist_id,
+                              'start_time': start, 'end_time': end})
+            written += count
+            if len(batch) >= BATCH:
+                insert(Show, batch)
+                batch = []
+        insert(Show, batch)
+
+        counters.recount()
+        db.session.commit()
+        echo(f'{written} shows in {time.perf_counter() - started:.1f}s')
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fill a database with synthetic Fyyur data.')
+    parser.add_argument('--venues', type=int, default=10000)
+    parser.add_argument('--artists', type=int, default=100000)
+    parser.add_argument('--shows', type=int, default=2000000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--anchor', type=date.fromisoformat, default=None,
+        help='Day splitting past and upcoming shows (YYYY-MM-DD, default today)')
+    parser.add_argument('--database', default=None,
+        help='SQLAlchemy URI (defaults to BENCH_DATABASE_URI or in-memory SQLite)')
+    args = parser.parse_args(argv)
+
+    # An in-memory database would be gone when the script exits
+    if (args.database or os.environ.get('BENCH_DATABASE_URI', DEFAULT_DATABASE_URI)) == DEFAULT_DATABASE_URI:
+        parser.error('give a database to fill with --database or BENCH_DATABASE_URI')
+
+    app = make_app(args.database)
+    generate(app, args.venues, args.artists, args.shows, args.seed, args.anchor)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
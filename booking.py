@@ -0,0 +1,112 @@
+#------------------------------------------------------------------#
+# Imports
+#------------------------------------------------------------------#
+from bisect import bisect_left
+from datetime import timedelta
+
+from sqlalchemy import and_, or_
+
+# Import user defined module
+from models import db, Artist, Venue, Show, MAX_SHOW_DURATION
+
+
+#------------------------------------------------------------------#
+# Double-booking detection
+#
+# A show occupies its artist and its venue over [start_time, end_time).
+# Shows last at most MAX_SHOW_DURATION minutes, so a show overlapping
+# [start, end) must start within [start - MAX_SHOW_DURATION, end): the
+# lookup is one range scan of the (venue_id, start_time) and
+# (artist_id, start_time) indexes whatever the size of the table.
+# On Postgres the exclusion constraints ex_shows_venue_booking and
+# ex_shows_artist_booking also reject overlaps written concurrently.
+#------------------------------------------------------------------#
+MAX_DURATION = timedelta(minutes=MAX_SHOW_DURATION)
+
+
+def overlapping(key, value, start, end):
+    return and_(key == value,
+                Show.start_time >= start - MAX_DURATION,
+                Show.start_time < end,
+                Show.end_time > start)
+
+
+# Shows with the artist and venue names used in the error messages
+def bookings_query():
+    return db.session.query(
+        Show.id, Show.artist_id, Show.venue_id, Show.start_time, Show.end_time,
+        Artist.name.label('artist_name'), Venue.name.label('venue_name'))\
+      .join(Artist, Artist.id == Show.artist_id)\
+      .join(Venue, Venue.id == Show.venue_id)
+
+
+# First show booking the artist or the venue during [start, end) / None
+def find_conflict(artist_id, venue_id, start, end):
+    return bookings_query()\
+      .filter(or_(overlapping(Show.venue_id, venue_id, start, end),
+                  overlapping(Show.artist_id, artist_id, start, end)))\
+      .order_by(Show.start_time, Show.id)\
+      .first()
+
+
+def describe_conflict(conflict, artist_id, venue_id):
+    booked = 'Venue {} is'.format(conflict.venue_name) if int(venue_id) == conflict.venue_id \
+      else 'Artist {} is'.format(conflict.artist_name)
+    return (f'{booked} already booked from {conflict.start_time:%Y-%m-%d %H:%M} to '
+            f'{conflict.end_time:%Y-%m-%d %H:%M} (show {conflict.id}: '
+            f'{conflict.artist_name} at {conflict.venue_name}).')
+
+
+# Conflicts of a batch of new shows (dicts with artist_id, venue_id,
+# start_time, end_time), with the table and with each other
+# Returns {index in rows: message}
+def batch_conflicts(rows):
+    conflicts = {}
+
+    # Within the batch: sweep the shows of each artist and venue by start
+    bookings = {}
+    for index, row in enumerate(rows):
+        bookings.setdefault(('Venue', row['venue_id']), []).append(index)
+        bookings.setdefault(('Artist', row['artist_id']), []).append(index)
+    for (kind, key), indexes in bookings.items():
+        indexes.sort(key=lambda i: (rows[i]['start_time'], i))
+        last = None
+        for index in indexes:
+            if index in conflicts:
+                continue
+            row = rows[index]
+            if last is not None and row['start_time'] < rows[last]['end_time']:
+                conflicts[index] = (f'{kind} {key} is booked twice in this import '
+                                    f'({rows[last]["start_time"]:%Y-%m-%d %H:%M} to '
+                                    f'{rows[last]["end_time"]:%Y-%m-%d %H:%M}).')
+            else:
+                last = index
+
+    # Against the shows already stored / one range query for the batch,
+    # then a binary search in the bookings of each artist and venue
+    rows_left = [index for index in range(len(rows)) if index not in conflicts]
+    if not rows_left:
+        return conflicts
+    stored = {}
+    for show in bookings_query().filter(
+            or_(Show.venue_id.in_({rows[i]['venue_id'] for i in rows_left}),
+                Show.artist_id.in_({rows[i]['artist_id'] for i in rows_left})),
+            Show.start_time >= min(rows[i]['start_time'] for i in rows_left) - MAX_DURATION,
+            Show.start_time < max(rows[i]['end_time'] for i in rows_left))\
+          .order_by(Show.start_time, Show.id):
+        stored.setdefault(('venue', show.venue_id), []).append(show)
+        stored.setdefault(('artist', show.artist_id), []).append(show)
+    starts = {key: [show.start_time for show in shows] for key, shows in stored.items()}
+
+    for index in rows_left:
+        row = rows[index]
+        for key in (('venue', row['venue_id']), ('artist', row['artist_id'])):
+            shows = stored.get(key, [])
+            first = bisect_left(starts.get(key, []), row['start_time'] - MAX_DURATION)
+            last = bisect_left(starts.get(key, []), row['end_time'])
+            conflict = next((show for show in shows[first:last]
+                             if show.end_time > row['start_time']), None)
+            if conflict is not None:
+                conflicts[index] = describe_conflict(conflict, row['artist_id'], row['venue_id'])
+                break
+    return conflicts
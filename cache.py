@@ -0,0 +1,220 @@
+#------------------------------------------------------------------#
+# Imports
+#------------------------------------------------------------------#
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+
+# Import user defined module
+from models import db, Show
+
+
+#------------------------------------------------------------------#
+# Cache backends
+#
+# Both backends store JSON-compatible values (the dicts the views
+# pass to the templates) and share the same small interface:
+# get(key), set(key, value, ttl) and delete_many(keys).
+#------------------------------------------------------------------#
+
+# In-process LRU cache bounded by size and time to live
+class LRUCache:
+
+    def __init__(self, max_entries=1024, default_ttl=300):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (ttl or self.default_ttl)
+        with self.lock:
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+# Redis backend / works with any client speaking the redis-py API
+# (get, set with ex, delete), so a local fake can stand in for Redis
+class RedisCache:
+
+    def __init__(self, client, default_ttl=300, prefix='fyyur:'):
+        self.client = client
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        import redis
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            return None
+        return json.loads(value)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, json.dumps(value),
+          ex=int(ttl or self.default_ttl))
+
+    def delete_many(self, keys):
+        keys = [self.prefix + key for key in keys]
+        if keys:
+            self.client.delete(*keys)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+# Backend used when caching is switched off
+class NullCache:
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete_many(self, keys):
+        pass
+
+    def clear(self):
+        pass
+
+
+#------------------------------------------------------------------#
+# Flask extension
+#
+#   CACHE_BACKEND = 'lru' | 'redis' | 'null'
+#   CACHE_DEFAULT_TTL = 300
+#   CACHE_MAX_ENTRIES = 1024        (lru)
+#   CACHE_REDIS_URL = 'redis://localhost:6379/0'   (redis)
+#------------------------------------------------------------------#
+class PageCache:
+
+    def __init__(self, app=None):
+        self.backend = NullCache()
+        if app is not None:
+            self.init_app(app)
+
+    # A ready made backend (for example a Redis fake) can be passed in
+    def init_app(self, app, backend=None):
+        app.config.setdefault('CACHE_BACKEND', 'lru')
+        app.config.setdefault('CACHE_DEFAULT_TTL', 300)
+        app.config.setdefault('CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+        if backend is None:
+            name = app.config['CACHE_BACKEND']
+            ttl = app.config['CACHE_DEFAULT_TTL']
+            if name == 'redis':
+                backend = RedisCache.from_url(app.config['CACHE_REDIS_URL'], default_ttl=ttl)
+            elif name == 'lru':
+                backend = LRUCache(app.config['CACHE_MAX_ENTRIES'], ttl)
+            else:
+                backend = NullCache()
+
+        self.backend = backend
+        self.default_ttl = app.config['CACHE_DEFAULT_TTL']
+        app.extensions['page_cache'] = self
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(key, value, ttl or self.default_ttl)
+
+    def delete_many(self, keys):
+        self.backend.delete_many(list(keys))
+
+    def clear(self):
+        self.backend.clear()
+
+    # Bypass the cache inside the block without touching stored entries
+    @contextmanager
+    def disabled(self):
+        backend, self.backend = self.backend, NullCache()
+        try:
+            yield
+        finally:
+            self.backend = backend
+
+
+cache = PageCache()
+
+
+#------------------------------------------------------------------#
+# Profile page keys and invalidation
+#------------------------------------------------------------------#
+def artist_key(artist_id):
+    return f'artist:{artist_id}'
+
+
+def venue_key(venue_id):
+    return f'venue:{venue_id}'
+
+
+# Keep a profile until its next upcoming show starts / the show then
+# moves from the upcoming to the past list
+def details_ttl(data):
+    ttl = cache.default_ttl
+    if data['upcoming_shows']:
+        start = datetime.strptime(data['upcoming_shows'][0]['start_time'], '%Y-%m-%d %H:%M:%S')
+        ttl = min(ttl, (start - datetime.now()).total_seconds())
+    return max(int(ttl), 1)
+
+
+# Ids of the venues an artist played at / of the artists a venue hosted
+def venues_of_artist(artist_id):
+    rows = db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()
+    return [row.venue_id for row in rows]
+
+
+def artists_of_venue(venue_id):
+    rows = db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()
+    return [row.artist_id for row in rows]
+
+
+# Venue pages list the artist name and image, so they go stale with it
+def invalidate_artist(artist_id, venue_ids=None):
+    if venue_ids is None:
+        venue_ids = venues_of_artist(artist_id)
+    cache.delete_many([artist_key(artist_id)] + [venue_key(venue_id) for venue_id in venue_ids])
+
+
+def invalidate_venue(venue_id, artist_ids=None):
+    if artist_ids is None:
+        artist_ids = artists_of_venue(venue_id)
+    cache.delete_many([venue_key(venue_id)] + [artist_key(artist_id) for artist_id in artist_ids])
+
+
+def invalidate_show(artist_id, venue_id):
+    cache.delete_many([artist_key(artist_id), venue_key(venue_id)])
@@ -0,0 +1,28 @@
+#--------------------------------------------------------------------------#
+# Imports
+#--------------------------------------------------------------------------#
+import click
+from flask.cli import AppGroup
+
+# Import user defined module
+from models import db
+import counters
+
+
+# flask counters <command>
+counters_cli = AppGroup('counters', help='Maintain the past/upcoming show counters.')
+
+
+@counters_cli.command('rollover')
+def rollover_command():
+    """Move the shows that started since the last run to the past counters."""
+    moved = counters.rollover()
+    click.echo(f'{moved} show(s) moved from upcoming to past')
+
+
+@counters_cli.command('recount')
+def recount_command():
+    """Rebuild every counter from the shows table."""
+    rolled_until = counters.recount()
+    db.session.commit()
+    click.echo(f'Counters rebuilt up to {rolled_until:%Y-%m-%d %H:%M:%S}')
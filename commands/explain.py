@@ -0,0 +1,137 @@
+#--------------------------------------------------------------------------#
+# Imports
+#--------------------------------------------------------------------------#
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import event
+
+# Import user defined module
+from models import *
+from search import search_engine
+from cache import cache
+
+
+# Endpoints that list a whole table and therefore scan it by design
+FULL_SCAN_ENDPOINTS = {
+    'artist_bp.artists',
+    'venue_bp.venues',
+}
+
+# Statements aggregating a whole table by design: the version and genre
+# counts behind the cached genre facets (see facets.py)
+FULL_SCAN_STATEMENTS = ('unnest(', 'json_each(', '.updated_at) AS max_1')
+
+
+# Requests exercising every read query of the blueprints
+#--------------------------------------------------------------------------#
+def blueprint_requests():
+    artist = db.session.query(Artist.id).order_by(Artist.id).first()
+    venue = db.session.query(Venue.id).order_by(Venue.id).first()
+    db.session.close()
+
+    requests = [
+        ('GET', '/', None),
+        ('GET', '/artists', None),
+        ('GET', '/artists?genre=Jazz', None),
+        ('GET', '/venues', None),
+        ('GET', '/venues?genre=Jazz', None),
+        ('GET', '/shows', None),
+        ('GET', '/shows?genre=Jazz', None),
+        ('GET', '/shows/calendar?genre=Jazz', None),
+        ('POST', '/artists/search', {'search_term': 'a'}),
+        ('POST', '/venues/search', {'search_term': 'a'}),
+        ('POST', '/artists/search', {'search_term': 'a', 'genre': 'Jazz'}),
+        ('POST', '/venues/search', {'search_term': 'jazz', 'genre': 'Jazz'}),
+        ('GET', '/api/v1/artists?genre=Jazz', None),
+        ('GET', '/api/v1/venues?genre=Jazz', None),
+    ]
+    if artist:
+        requests.append(('GET', f'/artists/{artist.id}', None))
+    if venue:
+        requests.append(('GET', f'/venues/{venue.id}', None))
+    return requests
+
+
+# Run the requests and capture the SQL each endpoint sends
+def capture_statements(app):
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    client = app.test_client()
+    results = []
+    for method, path, form in blueprint_requests():
+        captured.clear()
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            response = client.open(path, method=method, data=form)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        endpoint = app.url_map.bind('localhost').match(path.partition('?')[0], method=method)[0]
+        results.append((method, path, endpoint, response.status_code, list(captured)))
+    return results
+
+
+# Plan of one statement / returns the plan lines and whether a table is scanned
+#--------------------------------------------------------------------------#
+def explain(connection, statement, parameters):
+    dialect = connection.dialect.name
+    cursor = connection.connection.cursor()
+    try:
+        if dialect == 'postgresql':
+            # Make the planner use an index whenever one is usable, so a
+            # remaining sequential scan means no index matches the query
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN ' + statement, parameters)
+            lines = [row[0] for row in cursor.fetchall()]
+            scans = any('Seq Scan' in line for line in lines)
+        else:
+            cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+            lines = [row[-1] for row in cursor.fetchall()]
+            scans = any(line.startswith('SCAN') and 'USING' not in line
+                        for line in lines)
+    finally:
+        cursor.close()
+    return lines, scans
+
+
+@click.command('explain')
+@click.option('--strict', is_flag=True,
+    help='Exit with an error when an unexpected table scan is found.')
+@with_appcontext
+def explain_command(strict):
+    """Print EXPLAIN plans for the queries of every blueprint view."""
+    app = current_app._get_current_object()
+    regressions = []
+
+    # Build in-process search indexes first so only search queries are explained
+    search_engine.warm()
+
+    # Page caches would hide the queries behind cached pages
+    with cache.disabled():
+        results = capture_statements(app)
+
+    with db.engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            for method, path, endpoint, status, statements in results:
+                click.echo(f'== {method} {path} ({endpoint}) -> {status}')
+                for statement, parameters in statements:
+                    lines, scans = explain(connection, statement, parameters)
+                    click.echo('  ' + ' '.join(statement.split())[:160])
+                    for line in lines:
+                        click.echo('    ' + line)
+                    if scans and endpoint not in FULL_SCAN_ENDPOINTS \
+                       and not any(part in statement for part in FULL_SCAN_STATEMENTS):
+                        regressions.append((endpoint, statement))
+        finally:
+            transaction.rollback()
+
+    if regressions:
+        click.echo(f'\n{len(regressions)} statement(s) scan a table without an index:')
+        for endpoint, statement in regressions:
+            click.echo(f'  {endpoint}: ' + ' '.join(statement.split())[:120])
+        if strict:
+            raise SystemExit(1)
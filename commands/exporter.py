@@ -0,0 +1,22 @@
+#--------------------------------------------------------------------------#
+# Imports
+#--------------------------------------------------------------------------#
+import click
+from flask.cli import with_appcontext
+
+# Import user defined module
+from export import EXPORTS, FORMATS, export_chunks
+
+
+@click.command('export')
+@click.argument('kind', type=click.Choice(sorted(EXPORTS)))
+@click.option('--format', 'file_format', type=click.Choice(sorted(FORMATS)),
+    default='ndjson', show_default=True)
+@click.option('-o', '--output', type=click.File('wb'), default='-',
+    help='Output file (standard output by default).')
+@with_appcontext
+def export_command(kind, file_format, output):
+    """Stream all artists, venues or shows as CSV or NDJSON."""
+    for chunk in export_chunks(kind, file_format):
+        output.write(chunk)
+    output.flush()
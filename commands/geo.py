@@ -0,0 +1,87 @@
+#--------------------------------------------------------------------------#
+# Imports
+#--------------------------------------------------------------------------#
+import csv
+
+import click
+from flask.cli import AppGroup
+
+# Import user defined module
+from models import db, Venue, Place
+from geo import place_key, geocode_many, encode_geohash
+
+
+# flask geo <command>
+geo_cli = AppGroup('geo', help='Load the offline geocoding table and place venues.')
+
+# Suffixes of the place names in the Census Gazetteer files
+PLACE_SUFFIXES = ('city', 'town', 'village', 'borough', 'cdp', 'municipality')
+
+
+# Rows of a CSV (city,state,latitude,longitude) or a Census Gazetteer
+# places file (tab separated USPS, NAME, INTPTLAT, INTPTLONG)
+def read_places(stream):
+    sample = stream.readline()
+    delimiter = '\t' if '\t' in sample else ','
+    header = [name.strip().lower() for name in sample.split(delimiter)]
+    for values in csv.reader(stream, delimiter=delimiter):
+        row = dict(zip(header, (value.strip() for value in values)))
+        if 'usps' in row:
+            words = row['name'].split()
+            if len(words) > 1 and words[-1].lower() in PLACE_SUFFIXES:
+                words = words[:-1]
+            row = {'city': ' '.join(words), 'state': row['usps'],
+                   'latitude': row['intptlat'], 'longitude': row['intptlong']}
+        yield row
+
+
+@geo_cli.command('load')
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+def load_command(source):
+    """Replace the places table with the cities of a CSV or Gazetteer file."""
+    places = {}
+    for row in read_places(source):
+        try:
+            latitude, longitude = float(row['latitude']), float(row['longitude'])
+        except (KeyError, ValueError):
+            continue
+        key = (row['state'].upper(), place_key(row['city']))
+        places.setdefault(key, {
+            'city': row['city'], 'state': key[0], 'city_key': key[1],
+            'latitude': latitude, 'longitude': longitude,
+        })
+
+    db.session.query(Place).delete()
+    rows = list(places.values())
+    for start in range(0, len(rows), 5000):
+        db.session.execute(Place.__table__.insert(), rows[start:start + 5000])
+    db.session.commit()
+    click.echo(f'{len(rows)} places loaded')
+
+
+@geo_cli.command('backfill')
+@click.option('--all', 'everything', is_flag=True,
+    help='Place every venue again, not only the venues without coordinates.')
+def backfill_command(everything):
+    """Set the coordinates of venues from the places table."""
+    query = db.session.query(Venue.id, Venue.city, Venue.state)
+    if not everything:
+        query = query.filter(Venue.latitude.is_(None))
+    venues = query.all()
+
+    places = geocode_many((venue.city, venue.state) for venue in venues)
+    updates = []
+    for venue in venues:
+        place = places.get((place_key(venue.city), (venue.state or '').upper()))
+        if place:
+            updates.append({'venue_id': venue.id, 'lat': place[0], 'lon': place[1],
+                            'hash': encode_geohash(*place)})
+
+    table = Venue.__table__
+    statement = table.update().where(table.c.id == db.bindparam('venue_id'))\
+      .values(latitude=db.bindparam('lat'), longitude=db.bindparam('lon'),
+              geohash=db.bindparam('hash'))
+    for start in range(0, len(updates), 5000):
+        db.session.execute(statement, updates[start:start + 5000])
+    db.session.commit()
+    click.echo(f'{len(updates)} of {len(venues)} venue(s) placed')
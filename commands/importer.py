@@ -0,0 +1,428 @@
+#--------------------------------------------------------------------------#
+# Imports
+#--------------------------------------------------------------------------#
+import csv
+import io
+import json
+import multiprocessing
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+
+import click
+from flask.cli import with_appcontext
+from werkzeug.datastructures import MultiDict
+
+# Import user defined module
+from models import *
+from form_validate.forms import ArtistForm, VenueForm, ShowForm
+from search import search_engine
+from cache import artist_key, venue_key, cache
+from counters import record_shows
+from booking import batch_conflicts
+from geo import geocode_rows
+from matchmaking import matchmaker
+from feed import invalidate_feed
+
+
+#--------------------------------------------------------------------------#
+# Bulk import
+#
+#   flask import artists artists.csv
+#   flask import shows shows.jsonl --jobs 4 --errors rejected.jsonl
+#
+# Rows are streamed from CSV or JSON lines, validated with the same
+# forms as the web handlers, and inserted in batches (COPY on Postgres,
+# executemany elsewhere). Shows reference their artist and venue by
+# artist_id / venue_id or by artist_name / venue_name, resolved with
+# one query per batch, and last `duration` minutes or until `end_time`.
+# Shows double-booking an artist or venue are rejected. Each batch is
+# committed on its own.
+#--------------------------------------------------------------------------#
+
+# Form, model and form field -> column mapping of every importable kind
+KINDS = {
+    'artists': (ArtistForm, Artist, {
+        'name': 'name', 'city': 'city', 'state': 'state', 'phone': 'phone',
+        'genres': 'genres', 'image_link': 'image_link',
+        'facebook_link': 'facebook_link', 'website_link': 'website_link',
+        'seeking_venue': 'seeking_venue',
+        'seeking_description': 'seeking_description',
+    }),
+    'venues': (VenueForm, Venue, {
+        'name': 'name', 'city': 'city', 'state': 'state', 'address': 'address',
+        'phone': 'phone', 'genres': 'genres', 'image_link': 'image_link',
+        'facebook_link': 'facebook_link', 'website_link': 'website_link',
+        'seeking_talent': 'seeking_artist',
+        'seeking_description': 'seeking_description',
+    }),
+    'shows': (ShowForm, Show, {
+        'artist_id': 'artist_id', 'venue_id': 'venue_id', 'start_time': 'start_time',
+        'duration': 'duration',
+    }),
+}
+
+# Form fields holding several values
+LIST_FIELDS = {'genres'}
+
+
+# Reading rows
+#--------------------------------------------------------------------------#
+
+# A JSON line that is not an object / rejected like a row failing validation
+class InvalidRow:
+
+    def __init__(self, message):
+        self.message = message
+
+
+# Yield (line number, dict or InvalidRow) from a CSV or JSON lines file
+def read_rows(stream, file_format):
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_number, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                yield line_number, InvalidRow(f'Invalid JSON: {error}')
+                continue
+            if not isinstance(row, dict):
+                yield line_number, InvalidRow(f'Expected a JSON object, got {type(row).__name__}')
+                continue
+            yield line_number, row
+
+
+# Convert a row to form data / genres may be a list or comma separated
+def to_formdata(row):
+    items = []
+    for key, value in row.items():
+        if value is None or key is None:
+            continue
+        if key in LIST_FIELDS:
+            values = value if isinstance(value, list) else str(value).split(',')
+            items.extend((key, item.strip()) for item in values if item.strip())
+        elif isinstance(value, bool):
+            if value:
+                items.append((key, 'y'))
+        else:
+            items.append((key, str(value)))
+    return MultiDict(items)
+
+
+# Explicit venue coordinates / (latitude, longitude) or None when the
+# row has neither, then errors: both are needed, each within range
+def read_coordinates(row):
+    latitude, longitude = row.get('latitude'), row.get('longitude')
+    given = [value not in (None, '') for value in (latitude, longitude)]
+    if not any(given):
+        return None, None
+    if not all(given):
+        return None, {'coordinates': ['Give both latitude and longitude, or neither.']}
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        return None, {'coordinates': ['Latitude and longitude must be numbers.']}
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None, {'coordinates': ['Latitude must be within -90..90 and longitude within -180..180.']}
+    return (latitude, longitude), None
+
+
+# Validation / one reused form per process
+#--------------------------------------------------------------------------#
+class RowValidator:
+
+    def __init__(self, kind):
+        form_class, model, fields = KINDS[kind]
+        self.form = form_class(meta={'csrf': False})
+        self.fields = fields
+        self.kind = kind
+
+    # Returns (line, column values, None) or (line, None, errors)
+    def __call__(self, numbered_row):
+        line, row = numbered_row
+        if isinstance(row, InvalidRow):
+            return line, None, {'row': [row.message]}
+        self.form.process(to_formdata(row))
+        if not self.form.validate():
+            return line, None, self.form.errors
+
+        values = {column: self.form[field].data for field, column in self.fields.items()}
+        # Coordinates given in the row are kept, others are geocoded
+        if self.kind == 'venues':
+            coordinates, errors = read_coordinates(row)
+            if errors:
+                return line, None, errors
+            if coordinates:
+                values['latitude'], values['longitude'] = coordinates
+        if self.kind == 'shows':
+            values['artist_name'] = row.get('artist_name')
+            values['venue_name'] = row.get('venue_name')
+            values['end_time'] = row.get('end_time')
+        return line, values, None
+
+
+# Set in the parent before the worker processes are forked
+_validator = None
+
+
+def validate_chunk(chunk):
+    return [_validator(numbered_row) for numbered_row in chunk]
+
+
+# Resolving foreign keys of shows in bulk
+#--------------------------------------------------------------------------#
+
+# Map the given ids and names of a model to existing ids in two queries
+def lookup_ids(model, ids, names):
+    found = set()
+    by_name = {}
+    if ids:
+        found = {row.id for row in db.session.query(model.id).filter(model.id.in_(ids))}
+    if names:
+        for row in db.session.query(model.id, model.name).filter(model.name.in_(names)):
+            by_name.setdefault(row.name, []).append(row.id)
+    return found, by_name
+
+
+def resolve_key(values, key, found, by_name):
+    value = values.get(f'{key}_id')
+    if value:
+        try:
+            value = int(value)
+        except ValueError:
+            return None, f'{key}_id must be a number'
+        return (value, None) if value in found else (None, f'{key} {value} does not exist')
+
+    name = values.get(f'{key}_name')
+    matches = by_name.get(name, [])
+    if len(matches) == 1:
+        return matches[0], None
+    if matches:
+        return None, f'{key} name "{name}" is ambiguous'
+    return None, f'{key} "{name}" does not exist' if name else f'{key}_id or {key}_name is required'
+
+
+def resolve_shows(rows):
+    artist_ids, venue_ids, artist_names, venue_names = set(), set(), set(), set()
+    for line, values in rows:
+        for key, ids, names in (('artist', artist_ids, artist_names), ('venue', venue_ids, venue_names)):
+            value = values.get(f'{key}_id')
+            if value:
+                if str(value).isdigit():
+                    ids.add(int(value))
+            elif values.get(f'{key}_name'):
+                names.add(values[f'{key}_name'])
+
+    artists = lookup_ids(Artist, artist_ids, artist_names)
+    venues = lookup_ids(Venue, venue_ids, venue_names)
+
+    resolved, errors = [], []
+    for line, values in rows:
+        artist_id, artist_error = resolve_key(values, 'artist', *artists)
+        venue_id, venue_error = resolve_key(values, 'venue', *venues)
+        if artist_error or venue_error:
+            errors.append((line, {'foreign_key': [e for e in (artist_error, venue_error) if e]}))
+            continue
+        end_time, end_error = show_end(values)
+        if end_error:
+            errors.append((line, {'end_time': [end_error]}))
+            continue
+        resolved.append((line, {
+            'artist_id': artist_id,
+            'venue_id': venue_id,
+            'start_time': values['start_time'],
+            'end_time': end_time,
+        }))
+    return resolved, errors
+
+
+# End of a show from its end_time (as exported) or its duration in minutes
+def show_end(values):
+    start_time = values['start_time']
+    if not values.get('end_time'):
+        return start_time + timedelta(minutes=values.get('duration') or DEFAULT_SHOW_DURATION), None
+    try:
+        end_time = datetime.fromisoformat(str(values['end_time']))
+    except ValueError:
+        return None, 'end_time is not a valid date'
+    if not start_time <= end_time <= start_time + timedelta(minutes=MAX_SHOW_DURATION):
+        return None, f'end_time must be at most {MAX_SHOW_DURATION} minutes after start_time'
+    return end_time, None
+
+
+# Drop the shows double-booking an artist or a venue
+def reject_conflicts(rows):
+    conflicts = batch_conflicts([values for line, values in rows])
+    accepted = [row for index, row in enumerate(rows) if index not in conflicts]
+    errors = [(rows[index][0], {'booking': [message]}) for index, message in sorted(conflicts.items())]
+    return accepted, errors
+
+
+# Writing batches
+#--------------------------------------------------------------------------#
+
+# Fill the column defaults (COPY does not apply them)
+def complete_rows(table, rows):
+    defaults = {}
+    for column in table.columns:
+        if column.primary_key or column.default is None:
+            continue
+        if column.default.is_callable:
+            defaults[column.name] = column.default.arg
+        elif column.default.is_scalar:
+            defaults[column.name] = column.default.arg
+
+    completed = []
+    for row in rows:
+        row = dict(row)
+        for name, default in defaults.items():
+            if row.get(name) is None:
+                row[name] = default(None) if callable(default) else default
+        completed.append(row)
+    return completed
+
+
+def copy_value(value):
+    if value is None:
+        return None
+    if isinstance(value, list):
+        return '{' + ','.join('"' + str(item).replace('\\', '\\\\').replace('"', '\\"') + '"'
+                              for item in value) + '}'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return value
+
+
+def copy_rows(table, rows):
+    columns = list(rows[0].keys())
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(['\\N' if row[c] is None else copy_value(row[c]) for c in columns])
+    buffer.seek(0)
+
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f'COPY {table.name} ({", ".join(columns)}) FROM STDIN '
+            f"WITH (FORMAT csv, NULL '\\N')", buffer)
+    finally:
+        cursor.close()
+
+
+def write_batch(model, rows):
+    table = model.__table__
+    rows = complete_rows(table, rows)
+    if db.engine.dialect.name == 'postgresql':
+        copy_rows(table, rows)
+    else:
+        db.session.execute(table.insert(), rows)
+
+
+# After a batch of shows: counters and ETags (updated_at) of the owners
+def refresh_show_owners(rows):
+    record_shows(rows)
+    return {row['artist_id'] for row in rows}, {row['venue_id'] for row in rows}
+
+
+# Command
+#--------------------------------------------------------------------------#
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(sorted(KINDS)))
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'jsonl']),
+    help='Input format (guessed from the file extension by default).')
+@click.option('--batch-size', default=5000, show_default=True)
+@click.option('--jobs', default=1, show_default=True,
+    help='Processes used to validate rows.')
+@click.option('--errors', 'errors_file', type=click.File('w', encoding='utf-8'),
+    help='Write rejected rows as JSON lines to this file.')
+@with_appcontext
+def import_command(kind, source, file_format, batch_size, jobs, errors_file):
+    """Bulk import artists, venues or shows from CSV or JSON lines."""
+    global _validator
+
+    if file_format is None:
+        file_format = 'csv' if source.name.endswith('.csv') else 'jsonl'
+    model = KINDS[kind][1]
+    _validator = RowValidator(kind)
+
+    pool = None
+    if jobs > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        pool = multiprocessing.get_context('fork').Pool(jobs)
+
+    imported = rejected = 0
+    artist_ids, venue_ids = set(), set()
+    started = time.perf_counter()
+
+    def reject(line, errors):
+        click.echo(f'line {line}: ' + '; '.join(
+            f'{field}: {", ".join(messages)}' for field, messages in errors.items()), err=True)
+        if errors_file:
+            errors_file.write(json.dumps({'line': line, 'errors': errors}) + '\n')
+
+    try:
+        for batch in chunks(read_rows(source, file_format), batch_size):
+            if pool:
+                size = max(len(batch) // jobs, 1)
+                results = [result for part in pool.map(validate_chunk, list(chunks(batch, size)))
+                           for result in part]
+            else:
+                results = validate_chunk(batch)
+
+            valid = []
+            for line, values, errors in results:
+                if errors:
+                    rejected += 1
+                    reject(line, errors)
+                else:
+                    valid.append((line, values))
+
+            if kind == 'shows':
+                valid, errors = resolve_shows(valid)
+                valid, conflicts = reject_conflicts(valid)
+                for line, error in sorted(errors + conflicts, key=lambda item: item[0]):
+                    rejected += 1
+                    reject(line, error)
+
+            rows = [values for line, values in valid]
+            if not rows:
+                continue
+            if kind == 'venues':
+                geocode_rows(rows)
+            write_batch(model, rows)
+            if kind == 'shows':
+                batch_artists, batch_venues = refresh_show_owners(rows)
+                artist_ids |= batch_artists
+                venue_ids |= batch_venues
+            db.session.commit()
+            imported += len(rows)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    # Rows written with Core / refresh what is derived from them
+    search_engine.invalidate(model)
+    matchmaker.invalidate(model)
+    invalidate_feed()
+    cache.delete_many([artist_key(i) for i in artist_ids] + [venue_key(i) for i in venue_ids])
+
+    elapsed = time.perf_counter() - started
+    click.echo(f'{imported} {kind} imported, {rejected} rejected in {elapsed:.1f}s '
+               f'({imported / elapsed if elapsed else 0:.0f} rows/s)')
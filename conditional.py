@@ -0,0 +1,49 @@
+#------------------------------------------------------------------#
+# Imports
+#------------------------------------------------------------------#
+import hashlib
+
+from flask import make_response, request, session
+
+
+#------------------------------------------------------------------#
+# Conditional GET
+#
+# Views compute a cheap version of a page (a few indexed columns)
+# before loading or rendering anything. When the client already holds
+# that version a bodiless 304 is returned; otherwise the rendered
+# page is sent with ETag / Last-Modified so the next visit can
+# revalidate. The ETag is authoritative, Last-Modified is only used
+# when the client sends no If-None-Match.
+#------------------------------------------------------------------#
+class Validators:
+
+    def __init__(self, version, last_modified=None):
+        self.etag = hashlib.sha1(repr(version).encode()).hexdigest()
+        self.last_modified = last_modified.replace(microsecond=0) if last_modified else None
+
+        # Pages carrying flashed messages are never answered with a 304
+        self.enabled = not session.get('_flashes')
+
+    @property
+    def fresh(self):
+        if not self.enabled:
+            return False
+        if request.if_none_match:
+            return request.if_none_match.contains(self.etag)
+        if request.if_modified_since and self.last_modified:
+            return self.last_modified <= request.if_modified_since.replace(tzinfo=None)
+        return False
+
+    def not_modified(self):
+        return self.apply(make_response('', 304))
+
+    # Attach the validators to a rendered page
+    def apply(self, response):
+        response = make_response(response)
+        if self.enabled:
+            response.set_etag(self.etag)
+            if self.last_modified:
+                response.last_modified = self.last_modified
+            response.cache_control.no_cache = True
+        return response
@@ -0,0 +1,143 @@
+#------------------------------------------------------------------#
+# Imports
+#------------------------------------------------------------------#
+from datetime import datetime
+
+from sqlalchemy import bindparam, case, func
+
+# Import user defined module
+from models import db, Artist, Venue, Show, CounterState
+
+
+#------------------------------------------------------------------#
+# Past / upcoming show counters
+#
+# Artist and Venue carry past_shows_count and upcoming_shows_count so
+# any page can read them without counting shows. The counters are
+# exact relative to a watermark (CounterState.rolled_until): shows
+# starting up to it are past, later shows are upcoming.
+#   * creating or deleting shows adjusts the counters incrementally
+#   * rollover() moves the shows that started since the last run from
+#     upcoming to past and advances the watermark / run it periodically
+#     with `flask counters rollover` (every minute from cron or a timer)
+#   * recount() rebuilds every counter from the shows table
+#------------------------------------------------------------------#
+
+# Models owning counters with the matching foreign key of Show
+OWNERS = ((Artist, Show.artist_id), (Venue, Show.venue_id))
+
+
+# Current watermark / rows being written wait for a running rollover
+def watermark(lock=False):
+    query = db.session.query(CounterState)
+    if lock:
+        query = query.with_for_update(read=True)
+    state = query.get(1)
+    if state is None:
+        return recount()
+    return state.rolled_until
+
+
+# Add (delta=1) or remove (delta=-1) one show from its artist and venue
+def record_show(artist_id, venue_id, start_time, delta=1):
+    column = 'past_shows_count' if start_time <= watermark(lock=True) else 'upcoming_shows_count'
+    for model, owner_id in ((Artist, artist_id), (Venue, venue_id)):
+        db.session.query(model).filter(model.id == owner_id)\
+          .update({column: getattr(model, column) + delta}, synchronize_session=False)
+
+
+# Remove the shows matched by a filter (the shows of a deleted artist or
+# venue) from the counters of the other side / call before deleting them
+def forget_shows(*criteria):
+    rolled_until = watermark(lock=True)
+    for model, key in OWNERS:
+        rows = db.session.query(key,
+            func.sum(case((Show.start_time <= rolled_until, 1), else_=0)),
+            func.sum(case((Show.start_time > rolled_until, 1), else_=0)))\
+          .filter(*criteria).group_by(key).all()
+        for owner_id, past, upcoming in rows:
+            db.session.query(model).filter(model.id == owner_id).update({
+                model.past_shows_count: model.past_shows_count - past,
+                model.upcoming_shows_count: model.upcoming_shows_count - upcoming,
+                model.updated_at: datetime.utcnow(),
+            }, synchronize_session=False)
+
+
+# Move the shows that started since the last run from upcoming to past
+# Returns the number of shows moved
+def rollover(now=None):
+    now = now or datetime.now()
+    state = db.session.query(CounterState).with_for_update().get(1)
+    if state is None:
+        recount(now)
+        db.session.commit()
+        return 0
+
+    moved = 0
+    if now > state.rolled_until:
+        window = (Show.start_time > state.rolled_until, Show.start_time <= now)
+        for model, key in OWNERS:
+            rows = db.session.query(key, func.count(Show.id))\
+              .filter(*window).group_by(key).all()
+            for owner_id, count in rows:
+                db.session.query(model).filter(model.id == owner_id).update({
+                    model.past_shows_count: model.past_shows_count + count,
+                    model.upcoming_shows_count: model.upcoming_shows_count - count,
+                    model.updated_at: datetime.utcnow(),
+                }, synchronize_session=False)
+                if model is Artist:
+                    moved += count
+        state.rolled_until = now
+
+    db.session.commit()
+    return moved
+
+
+# Rebuild the counters from the shows table and reset the watermark
+# Returns the new watermark
+def recount(now=None):
+    now = now or datetime.now()
+    for model, key in OWNERS:
+        update_counts(model, key, now)
+
+    state = db.session.query(CounterState).get(1)
+    if state is None:
+        db.session.add(CounterState(id=1, rolled_until=now))
+    else:
+        state.rolled_until = now
+    return now
+
+
+# Add a batch of new shows (dicts with artist_id, venue_id, start_time)
+# to the counters with one executemany per side
+def record_shows(rows):
+    rolled_until = watermark(lock=True)
+    for model, key in OWNERS:
+        deltas = {}
+        for row in rows:
+            past, upcoming = deltas.get(row[key.key], (0, 0))
+            if row['start_time'] <= rolled_until:
+                past += 1
+            else:
+                upcoming += 1
+            deltas[row[key.key]] = (past, upcoming)
+
+        table = model.__table__
+        db.session.execute(
+            table.update().where(table.c.id == bindparam('owner_id')).values(
+                past_shows_count=table.c.past_shows_count + bindparam('past'),
+                upcoming_shows_count=table.c.upcoming_shows_count + bindparam('upcoming'),
+                updated_at=bindparam('now')),
+            [{'owner_id': owner_id, 'past': past, 'upcoming': upcoming, 'now': datetime.utcnow()}
+             for owner_id, (past, upcoming) in deltas.items()])
+
+
+def update_counts(model, key, rolled_until, *criteria):
+    past = db.session.query(func.count(Show.id))\
+      .filter(key == model.id, Show.start_time <= rolled_until).scalar_subquery()
+    upcoming = db.session.query(func.count(Show.id))\
+      .filter(key == model.id, Show.start_time > rolled_until).scalar_subquery()
+    db.session.query(model).filter(*criteria).update({
+        model.past_shows_count: past,
+        model.upcoming_shows_count: upcoming,
+    }, synchronize_session=False)
@@ -0,0 +1,152 @@
+#------------------------------------------------------------------#
+# Imports
+#------------------------------------------------------------------#
+import csv
+import io
+import json
+from datetime import datetime
+
+# Fast encoder when available / the standard library otherwise
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Import user defined module
+from models import db, Artist, Venue, Show
+
+
+#------------------------------------------------------------------#
+# Fields exposed by the API and the exports
+#------------------------------------------------------------------#
+ARTIST_FIELDS = {
+    'id': Artist.id,
+    'name': Artist.name,
+    'city': Artist.city,
+    'state': Artist.state,
+    'phone': Artist.phone,
+    'genres': Artist.genres,
+    'image_link': Artist.image_link,
+    'facebook_link': Artist.facebook_link,
+    'website_link': Artist.website_link,
+    'seeking_venue': Artist.seeking_venue,
+    'seeking_description': Artist.seeking_description,
+    'past_shows_count': Artist.past_shows_count,
+    'upcoming_shows_count': Artist.upcoming_shows_count,
+}
+
+VENUE_FIELDS = {
+    'id': Venue.id,
+    'name': Venue.name,
+    'city': Venue.city,
+    'state': Venue.state,
+    'address': Venue.address,
+    'phone': Venue.phone,
+    'genres': Venue.genres,
+    'image_link': Venue.image_link,
+    'facebook_link': Venue.facebook_link,
+    'website_link': Venue.website_link,
+    'seeking_talent': Venue.seeking_artist,
+    'seeking_description': Venue.seeking_description,
+    'past_shows_count': Venue.past_shows_count,
+    'upcoming_shows_count': Venue.upcoming_shows_count,
+    'latitude': Venue.latitude,
+    'longitude': Venue.longitude,
+}
+
+SHOW_FIELDS = {
+    'id': Show.id,
+    'artist_id': Show.artist_id,
+    'venue_id': Show.venue_id,
+    'start_time': Show.start_time,
+    'end_time': Show.end_time,
+}
+
+EXPORTS = {
+    'artists': (Artist, ARTIST_FIELDS),
+    'venues': (Venue, VENUE_FIELDS),
+    'shows': (Show, SHOW_FIELDS),
+}
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Rows fetched per round trip and bytes per streamed chunk
+FETCH_SIZE = 2000
+CHUNK_SIZE = 64 * 1024
+
+
+# JSON encoding shared with the API
+#------------------------------------------------------------------#
+def encode_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload, default=encode_default)
+    return json.dumps(payload, separators=(',', ':'), default=encode_default).encode()
+
+
+#------------------------------------------------------------------#
+# Streaming export
+#
+# Rows come from a server-side cursor (stream_results + yield_per), so
+# memory stays flat whatever the table size, and are encoded into
+# chunks of about CHUNK_SIZE bytes yielded as soon as they are full.
+#------------------------------------------------------------------#
+def export_rows(kind):
+    model, fields = EXPORTS[kind]
+    query = db.session.query(*[column.label(name) for name, column in fields.items()])\
+      .order_by(model.id)\
+      .execution_options(stream_results=True)\
+      .yield_per(FETCH_SIZE)
+    for row in query:
+        yield row
+
+
+# Values written the way `flask import` reads them back
+def csv_value(value):
+    if isinstance(value, list):
+        return ','.join(value)
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+
+def csv_chunks(kind, rows):
+    fields = list(EXPORTS[kind][1])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for row in rows:
+        writer.writerow([csv_value(value) for value in row])
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def ndjson_chunks(kind, rows):
+    chunk = bytearray()
+    for row in rows:
+        chunk += dumps(dict(row._mapping))
+        chunk += b'\n'
+        if len(chunk) >= CHUNK_SIZE:
+            yield bytes(chunk)
+            chunk.clear()
+    yield bytes(chunk)
+
+
+def export_chunks(kind, file_format):
+    rows = export_rows(kind)
+    if file_format == 'csv':
+        return csv_chunks(kind, rows)
+    return ndjson_chunks(kind, rows)
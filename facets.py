@@ -0,0 +1,83 @@
+#------------------------------------------------------------------#
+# Imports
+#------------------------------------------------------------------#
+from flask import abort, request
+
+# Import user defined module
+from models import db, has_genre
+from form_validate.enums import Genre
+from cache import cache
+
+
+#------------------------------------------------------------------#
+# Genre filters
+#
+# Listings and searches take ?genre= (a Genre name or label). The genres
+# columns are GIN indexed on Postgres, so the filter is an index lookup.
+#------------------------------------------------------------------#
+
+# Genre name as stored (Genre member name) from a name or label / 400 if unknown
+def parse_genre(value):
+    for genre in Genre:
+        if value.lower() in (genre.name.lower(), genre.value.lower()):
+            return genre.name
+    abort(400)
+
+
+# Genre asked for in the query string or the posted form / None for all
+def requested_genre():
+    value = request.values.get('genre')
+    return parse_genre(value) if value else None
+
+
+def filter_genre(query, model, genre):
+    if genre is None:
+        return query
+    return query.filter(has_genre(model.genres, genre))
+
+
+#------------------------------------------------------------------#
+# Facet counts
+#
+# The number of artists or venues of every genre comes from one grouped
+# query over the unnested genres column. The counts are cached under the
+# version of the listing (last write and row count), so any insert,
+# update or delete starts a new entry and nothing has to invalidate it.
+#------------------------------------------------------------------#
+
+# Last write and row count of a model / the version of its listings
+def listing_version(model):
+    return db.session.query(db.func.max(model.updated_at), db.func.count(model.id)).one()
+
+
+# One row per (row, genre) pair / unnest on Postgres, json_each on SQLite
+def genre_values(model):
+    if db.engine.dialect.name == 'postgresql':
+        return db.session.query(db.func.unnest(model.genres).label('genre')).subquery()
+    each = db.func.json_each(model.genres).table_valued('value')
+    return db.session.query(each.c.value.label('genre'))\
+      .select_from(model).join(each, db.true()).subquery()
+
+
+# {genre name: number of rows} in a single query
+def genre_counts(model):
+    values = genre_values(model)
+    rows = db.session.query(values.c.genre, db.func.count())\
+      .group_by(values.c.genre)
+    return {genre: count for genre, count in rows}
+
+
+# Facets in Genre order: name, label, count and whether it is the filter
+def genre_facets(model, version, selected=None):
+    last_update, count = version
+    key = f'facets:{model.__tablename__}:{last_update.isoformat() if last_update else ""}:{count}'
+    counts = cache.get(key)
+    if counts is None:
+        counts = genre_counts(model)
+        cache.set(key, counts)
+    return [{
+        'name': genre.name,
+        'label': genre.value,
+        'count': counts.get(genre.name, 0),
+        'selected': genre.name == selected,
+    } for genre in Genre]
@@ -0,0 +1,137 @@
+#------------------------------------------------------------------#
+# Imports
+#------------------------------------------------------------------#
+import os
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import desc
+
+# Import user defined module
+from models import db, Artist, Venue, Show
+from cache import cache
+
+
+#------------------------------------------------------------------#
+# Home page feed
+#
+#   HOME_FEED_SIZE = 5               entries per section
+#   HOME_FEED_REFRESH_SECONDS = 60   background refresh period, 0 for none
+#   HOME_TRENDING_DAYS = 7           window of the trending sections
+#
+# The recent and trending artists and venues are computed together and
+# stored in the page cache. A thread per worker rebuilds the entry every
+# HOME_FEED_REFRESH_SECONDS, and right away when a view writes something
+# the home page lists, so a home page hit only reads the cache. The page
+# builds the feed itself only when the entry is missing (first hit, or
+# a cache shared by workers being cleared).
+#------------------------------------------------------------------#
+FEED_KEY = 'home:feed'
+
+
+def recent(model, limit):
+    rows = db.session.query(model.id, model.name).order_by(desc(model.id)).limit(limit)
+    return [{'id': row.id, 'name': row.name} for row in rows]
+
+
+# Artists or venues with the most shows in the coming days / one range
+# scan of the start_time index grouped by owner, then the top names
+def trending(model, column, days, limit):
+    now = datetime.now()
+    counts = db.session.query(column.label('id'), db.func.count(Show.id).label('shows'))\
+      .filter(Show.start_time >= now, Show.start_time < now + timedelta(days=days))\
+      .group_by(column).order_by(desc('shows'), column).limit(limit).subquery()
+    rows = db.session.query(model.id, model.name, counts.c.shows)\
+      .join(counts, counts.c.id == model.id).order_by(desc(counts.c.shows), model.id)
+    return [{'id': row.id, 'name': row.name, 'shows': row.shows} for row in rows]
+
+
+def build_feed():
+    config = current_app.config
+    size = config.get('HOME_FEED_SIZE', 5)
+    days = config.get('HOME_TRENDING_DAYS', 7)
+    return {
+        'venues': recent(Venue, size),
+        'artists': recent(Artist, size),
+        'trending_venues': trending(Venue, Show.venue_id, days, size),
+        'trending_artists': trending(Artist, Show.artist_id, days, size),
+        'trending_days': days,
+    }
+
+
+# Kept well past the refresh period so a slow refresh never leaves a gap
+def feed_ttl():
+    return max(current_app.config.get('HOME_FEED_REFRESH_SECONDS', 60) * 10, cache.default_ttl)
+
+
+def refresh_feed():
+    feed = build_feed()
+    cache.set(FEED_KEY, feed, feed_ttl())
+    return feed
+
+
+# Feed of the home page / from the cache, built here only on a miss
+def home_feed():
+    feed_refresher.start(current_app._get_current_object())
+    feed = cache.get(FEED_KEY)
+    if feed is None:
+        feed = refresh_feed()
+    return feed
+
+
+# An artist, venue or show was written / rebuild the feed in the background
+def invalidate_feed():
+    if not feed_refresher.wake():
+        cache.delete_many([FEED_KEY])
+
+
+#------------------------------------------------------------------#
+# Background refresh / one daemon thread per worker process, started
+# by the first home page hit (after the fork of a preloading server)
+#------------------------------------------------------------------#
+class FeedRefresher:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.event = threading.Event()
+        self.thread = None
+        self.pid = None
+
+    def running(self):
+        return self.thread is not None and self.thread.is_alive() and self.pid == os.getpid()
+
+    def start(self, app):
+        if self.running() or not app.config.get('HOME_FEED_REFRESH_SECONDS', 60):
+            return
+        with self.lock:
+            if self.running():
+                return
+            self.pid = os.getpid()
+            self.event = threading.Event()
+            self.thread = threading.Thread(target=self.run, args=(app,),
+              name='home-feed-refresh', daemon=True)
+            self.thread.start()
+
+    # Refresh now / False when no refresher runs in this process
+    def wake(self):
+        if not self.running():
+            return False
+        self.event.set()
+        return True
+
+    def run(self, app):
+        interval = app.config.get('HOME_FEED_REFRESH_SECONDS', 60)
+        while True:
+            self.event.wait(interval)
+            self.event.clear()
+            with app.app_context():
+                try:
+                    refresh_feed()
+                except Exception:
+                    app.logger.exception('Home feed refresh failed')
+                finally:
+                    db.session.remove()
+
+
+feed_refresher = FeedRefresher()
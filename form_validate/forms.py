@@ -1,29 +1,65 @@
 from datetime import datetime
+from functools import lru_cache
 from flask_wtf import FlaskForm as Form #Suggested
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, ValidationError
-from wtforms.validators import DataRequired, AnyOf, URL
-import phonenumbers
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField, ValidationError
+from wtforms.validators import DataRequired, AnyOf, URL, NumberRange, Optional
 
 # Import user defined module
 from form_validate.enums import Genre, State
+from models import DEFAULT_SHOW_DURATION, MAX_SHOW_DURATION
 
 
 # Get the state and genre choices from enum file
 genres_choices = Genre.choices()
 state_choices = State.choices()
 
+# Verdicts memoized per process / bulk imports validate the same
+# numbers and links over and over
+VALIDATION_CACHE_SIZE = 65536
+
+
+# Whether a 10 digit number is a valid phone number / parsed as a US
+# number unless it starts with + (an international number). phonenumbers
+# loads large metadata, so it is imported on first use rather than when
+# the app boots
+@lru_cache(maxsize=VALIDATION_CACHE_SIZE)
+def is_valid_phone(number):
+    import phonenumbers
+    if len(number) != 10:
+        return False
+    try:
+        return phonenumbers.is_valid_number(phonenumbers.parse(number, 'US'))
+    except phonenumbers.NumberParseException:
+        return False
+
+
 # Function to validate phone number
 def validate_phone(form, field):
-    if len(field.data) != 10:
+    if not is_valid_phone(field.data or ''):
         raise ValidationError('Invalid phone number.')
-    try:
-        input_number = phonenumbers.parse(field.data)
-        if not (phonenumbers.is_valid_number(input_number)):
-           raise ValidationError('Invalid phone number.')
-    except:
-        input_number = phonenumbers.parse("+1"+field.data)
-        if not (phonenumbers.is_valid_number(input_number)):
-            raise ValidationError('Invalid phone number.')
+
+
+# URL() remembering the error of each value it checked (None when valid)
+class CachedURL(URL):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.errors = {}
+
+    def __call__(self, form, field):
+        value = field.data
+        if value in self.errors:
+            error = self.errors[value]
+        else:
+            try:
+                super().__call__(form, field)
+                error = None
+            except ValidationError as invalid:
+                error = str(invalid)
+            if len(self.errors) < VALIDATION_CACHE_SIZE:
+                self.errors[value] = error
+        if error is not None:
+            raise ValidationError(error)
 
 # ShowForm
 class ShowForm(Form):
@@ -38,6 +74,12 @@ class ShowForm(Form):
         validators=[DataRequired()],
         default= datetime.today()
     )
+    # Minutes / bounded so conflict checks scan a bounded index range
+    duration = IntegerField(
+        'duration',
+        validators=[Optional(), NumberRange(min=1, max=MAX_SHOW_DURATION)],
+        default=DEFAULT_SHOW_DURATION
+    )
 
 # VenueForm
 class VenueForm(Form):
@@ -58,17 +100,17 @@ class VenueForm(Form):
         'phone', validators=[DataRequired(), validate_phone]
     )
     image_link = StringField(
-        'image_link', validators=[URL()]
+        'image_link', validators=[CachedURL()]
     )
     genres = SelectMultipleField(
         'genres', validators=[DataRequired()],
         choices = genres_choices
     )
     facebook_link = StringField(
-        'facebook_link', validators=[URL()]
+        'facebook_link', validators=[CachedURL()]
     )
     website_link = StringField(
-        'website_link', validators = [URL()]
+        'website_link', validators = [CachedURL()]
     )
 
     seeking_talent = BooleanField( 'seeking_talent' )
@@ -93,18 +135,18 @@ class ArtistForm(Form):
         'phone', validators=[DataRequired(), validate_phone]
     )
     image_link = StringField(
-        'image_link', validators=[URL()]
+        'image_link', validators=[CachedURL()]
     )
     genres = SelectMultipleField(
         'genres', validators=[DataRequired()],
         choices=genres_choices
      )
     facebook_link = StringField(
-        'facebook_link', validators=[URL()]
+        'facebook_link', validators=[CachedURL()]
      )
 
     website_link = StringField(
-        'website_link', validators=[URL()]
+        'website_link', validators=[CachedURL()]
      )
 
     seeking_venue = BooleanField( 'seeking_venue' )
@@ -6,7 +6,8 @@ from flask import (
     url_for
 )
 from models import *
-from sqlalchemy import desc
+from routing import read_only
+from feed import home_feed
 
 
 # Create a artist blueprint object
@@ -14,12 +15,13 @@ general_bp = Blueprint('general_bp', __name__)
 
 
 @general_bp.route('/')
+@read_only
 def index():
-  # Get the first 10 venues
-  venues = Venue.query.order_by(desc(Venue.id)).limit(5).all()
-
-  # Get the first 10 arists
-  artists = Artist.query.order_by(desc(Artist.id)).limit(5).all()
+  # Recent and trending venues and artists / cached and refreshed in the
+  # background, so the page usually runs no query (see feed.py)
+  feed = home_feed()
 
   #Redirect to home page
-  return render_template('pages/home.html', venues=venues, artists=artists)
+  return render_template('pages/home.html', venues=feed['venues'], artists=feed['artists'],
+    trending_venues=feed['trending_venues'], trending_artists=feed['trending_artists'],
+    trending_days=feed['trending_days'])
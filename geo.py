@@ -0,0 +1,220 @@
+#------------------------------------------------------------------#
+# Imports
+#------------------------------------------------------------------#
+import math
+
+from sqlalchemy import and_, event, inspect, or_, select
+
+# Import user defined module
+from models import db, Venue, Place
+
+
+#------------------------------------------------------------------#
+# Geohash
+#
+# A geohash interleaves longitude and latitude bits into base 32: every
+# extra character splits the cell into 32, and cells sharing a prefix
+# are close. Venues store a 12 character geohash with a btree index, so
+# the venues of a cell are one range scan on any database (no PostGIS).
+#------------------------------------------------------------------#
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 12
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        # Even bits split longitude, odd bits latitude
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+# Height and width of a cell in degrees
+def cell_size(precision):
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + \
+        math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+# Longest precision whose cells are at least radius_km high and wide around
+# the latitude / a few cells of it then cover the circle (covering_cells)
+def covering_precision(latitude, radius_km):
+    # Width shrinks towards the poles: measure it at the far edge of the circle
+    edge = min(abs(latitude) + radius_km / KM_PER_DEGREE, 89.9)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        if height * KM_PER_DEGREE >= radius_km and \
+           width * KM_PER_DEGREE * math.cos(math.radians(edge)) >= radius_km:
+            return precision
+    return None
+
+
+# Degrees of latitude and longitude spanned by radius_km around a point /
+# longitude is None when the circle reaches a pole (all longitudes)
+def bounding_box(latitude, radius_km):
+    dlat = radius_km / KM_PER_DEGREE
+    if abs(latitude) + dlat >= 90:
+        return dlat, None
+    dlon = dlat / math.cos(math.radians(abs(latitude) + dlat))
+    return dlat, (dlon if dlon < 180 else None)
+
+
+# Cells covering the bounding box of the circle / None when the radius
+# needs cells larger than a 1 character geohash (search everything).
+# The cells are at least radius_km wide, so every cell crossing the box
+# holds one of the corners, edge middles or center: usually 4 cells
+def covering_cells(latitude, longitude, radius_km):
+    precision = covering_precision(latitude, radius_km)
+    dlat, dlon = bounding_box(latitude, radius_km)
+    if precision is None or dlon is None:
+        return None
+    cells = set()
+    for lat in (latitude - dlat, latitude, latitude + dlat):
+        lat = max(-90.0, min(90.0, lat))
+        for lon in (longitude - dlon, longitude, longitude + dlon):
+            # Wrap around the antimeridian
+            cells.add(encode_geohash(lat, (lon + 180) % 360 - 180, precision))
+    return sorted(cells)
+
+
+# End of the range of geohashes starting with prefix / None when unbounded
+def prefix_end(prefix):
+    while prefix:
+        position = BASE32.index(prefix[-1])
+        if position + 1 < len(BASE32):
+            return prefix[:-1] + BASE32[position + 1]
+        prefix = prefix[:-1]
+    return None
+
+
+def in_cells(column, cells):
+    conditions = []
+    for cell in cells:
+        end = prefix_end(cell)
+        conditions.append(column >= cell if end is None else and_(column >= cell, column < end))
+    return or_(*conditions)
+
+
+#------------------------------------------------------------------#
+# Venues near a point
+#------------------------------------------------------------------#
+NEAR_COLUMNS = (Venue.id, Venue.name, Venue.city, Venue.state, Venue.address,
+                Venue.latitude, Venue.longitude, Venue.upcoming_shows_count)
+
+
+# Venues within radius_km, nearest first / list of (distance km, row)
+def venues_within(latitude, longitude, radius_km, limit=None):
+    query = db.session.query(*NEAR_COLUMNS).filter(Venue.geohash.isnot(None))
+    cells = covering_cells(latitude, longitude, radius_km)
+    if cells is not None:
+        # The geohash ranges use the index; the box trims the cell corners
+        dlat, dlon = bounding_box(latitude, radius_km)
+        query = query.filter(in_cells(Venue.geohash, cells),
+                             Venue.latitude.between(latitude - dlat, latitude + dlat))
+        if -180 <= longitude - dlon and longitude + dlon <= 180:
+            query = query.filter(Venue.longitude.between(longitude - dlon, longitude + dlon))
+
+    results = []
+    for row in query:
+        distance = haversine_km(latitude, longitude, row.latitude, row.longitude)
+        if distance <= radius_km:
+            results.append((distance, row))
+    results.sort(key=lambda result: (result[0], result[1].id))
+    return results[:limit] if limit else results
+
+
+# The limit nearest venues within max_radius_km / grows the radius until
+# enough venues are found, each step being an exact radius search
+def nearest_venues(latitude, longitude, limit, start_radius_km=2, max_radius_km=20000):
+    radius = start_radius_km
+    while True:
+        results = venues_within(latitude, longitude, radius, limit)
+        if len(results) >= limit or radius >= max_radius_km:
+            return results
+        radius = min(radius * 4, max_radius_km)
+
+
+#------------------------------------------------------------------#
+# Offline geocoding
+#
+# Venues are placed at the coordinates of their city, looked up in the
+# places table (loaded with `flask geo load`). A venue keeps coordinates
+# that were set explicitly, until its city or state changes.
+#------------------------------------------------------------------#
+def place_key(city):
+    return ' '.join((city or '').lower().split())
+
+
+def geocode(connection, city, state):
+    if not city or not state:
+        return None
+    return connection.execute(
+        select(Place.latitude, Place.longitude)
+        .where(Place.state == state.upper(), Place.city_key == place_key(city))
+    ).first()
+
+
+def set_coordinates(target, latitude, longitude):
+    target.latitude = latitude
+    target.longitude = longitude
+    target.geohash = None if latitude is None else encode_geohash(latitude, longitude)
+
+
+@event.listens_for(Venue, 'before_insert')
+@event.listens_for(Venue, 'before_update')
+def geocode_venue(mapper, connection, target):
+    state = inspect(target)
+    moved = state.attrs.city.history.has_changes() or state.attrs.state.history.has_changes()
+    given = state.attrs.latitude.history.has_changes() or state.attrs.longitude.history.has_changes()
+
+    if given and target.latitude is not None and target.longitude is not None:
+        set_coordinates(target, target.latitude, target.longitude)
+    elif moved or target.latitude is None:
+        place = geocode(connection, target.city, target.state)
+        set_coordinates(target, *(place or (None, None)))
+
+
+# Coordinates of many (city, state) pairs in one query / {(city key, state): (lat, lon)}
+def geocode_many(pairs):
+    keys = {(place_key(city), (state or '').upper()) for city, state in pairs if city and state}
+    if not keys:
+        return {}
+    rows = db.session.query(Place.city_key, Place.state, Place.latitude, Place.longitude)\
+      .filter(Place.state.in_({state for key, state in keys}),
+              Place.city_key.in_({key for key, state in keys}))
+    return {(row.city_key, row.state): (row.latitude, row.longitude) for row in rows
+            if (row.city_key, row.state) in keys}
+
+
+# Fill latitude, longitude and geohash of venue rows written with Core
+def geocode_rows(rows):
+    places = geocode_many((row.get('city'), row.get('state')) for row in rows)
+    for row in rows:
+        if row.get('latitude') is None or row.get('longitude') is None:
+            row['latitude'], row['longitude'] = places.get(
+                (place_key(row.get('city')), (row.get('state') or '').upper()), (None, None))
+        row['geohash'] = None if row['latitude'] is None else \
+            encode_geohash(row['latitude'], row['longitude'])
+    return rows
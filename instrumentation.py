@@ -0,0 +1,194 @@
+#------------------------------------------------------------------#
+# Imports
+#------------------------------------------------------------------#
+import hashlib
+import re
+import threading
+import time
+from collections import Counter
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+#------------------------------------------------------------------#
+# Per-request SQL instrumentation
+#
+#   SQL_INSTRUMENTATION = True      record the queries of every request
+#   SQL_NPLUSONE_THRESHOLD = 5      same statement this often = N+1
+#   SQL_NPLUSONE_ACTION = 'warn'    'warn', 'raise' (tests) or 'ignore'
+#   SQL_LOG_REQUESTS = False        one log line per request, not only N+1
+#   SQL_STATS_ENDPOINT = False      serve the endpoint stats at /api/v1/sql
+#
+# Engine events time every statement sent to any engine (replicas
+# included) while a request is handled. Statements are grouped by
+# fingerprint (the SQL without literals, IN lists collapsed), so one
+# statement run for each row of a page stands out as an N+1.
+#
+# Each response gets a Server-Timing header (db time and query count,
+# shown by the browser dev tools) and X-DB-Queries. Totals per endpoint
+# are kept per worker process.
+#------------------------------------------------------------------#
+class NPlusOneError(RuntimeError):
+    pass
+
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDER = r'(?:\?|%s|%\(\w+\)s|:\w+)'
+IN_LIST = re.compile(rf'\(\s*{PLACEHOLDER}(?:\s*,\s*{PLACEHOLDER})+\s*\)')
+SPACES = re.compile(r'\s+')
+
+
+# SQL text without literals and with IN lists collapsed to one placeholder
+def normalize(statement):
+    statement = STRING_LITERAL.sub('?', statement)
+    statement = NUMBER_LITERAL.sub('?', statement)
+    statement = IN_LIST.sub('(?)', statement)
+    return SPACES.sub(' ', statement).strip()
+
+
+def fingerprint(statement):
+    return hashlib.sha1(normalize(statement).encode()).hexdigest()[:12]
+
+
+# Queries of one request
+class QueryRecorder:
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.fingerprints = Counter()
+        self.statements = {}
+
+    def record(self, statement, seconds):
+        key = fingerprint(statement)
+        self.count += 1
+        self.seconds += seconds
+        self.fingerprints[key] += 1
+        self.statements.setdefault(key, statement)
+
+    # [(fingerprint, count, SQL)] of the statements run at least threshold times
+    def repeated(self, threshold):
+        return [(key, count, normalize(self.statements[key]))
+                for key, count in self.fingerprints.most_common()
+                if count >= threshold]
+
+
+def current_recorder():
+    return g.get('sql_recorder') if has_app_context() else None
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_start'].pop()
+    recorder = current_recorder()
+    if recorder is not None:
+        recorder.record(statement, time.perf_counter() - started)
+
+
+# A failed statement never reaches after_cursor_execute
+@event.listens_for(Engine, 'handle_error')
+def drop_query_timer(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('query_start'):
+        connection.info['query_start'].pop()
+
+
+#------------------------------------------------------------------#
+# Totals per endpoint / per worker process
+#------------------------------------------------------------------#
+class EndpointStats:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def record(self, endpoint, recorder, n_plus_one):
+        with self.lock:
+            stats = self.endpoints.setdefault(endpoint, {
+                'requests': 0, 'queries': 0, 'db_ms': 0.0,
+                'max_queries': 0, 'n_plus_one': 0,
+            })
+            stats['requests'] += 1
+            stats['queries'] += recorder.count
+            stats['db_ms'] += recorder.seconds * 1000
+            stats['max_queries'] = max(stats['max_queries'], recorder.count)
+            stats['n_plus_one'] += bool(n_plus_one)
+
+    def snapshot(self):
+        with self.lock:
+            return {endpoint: dict(stats,
+                      db_ms=round(stats['db_ms'], 3),
+                      avg_queries=round(stats['queries'] / stats['requests'], 2))
+                    for endpoint, stats in sorted(self.endpoints.items())}
+
+    def reset(self):
+        with self.lock:
+            self.endpoints.clear()
+
+
+endpoint_stats = EndpointStats()
+
+
+#------------------------------------------------------------------#
+# Request hooks
+#------------------------------------------------------------------#
+def start_recording():
+    g.sql_recorder = QueryRecorder()
+
+
+def finish_recording(response):
+    recorder = g.pop('sql_recorder', None)
+    if recorder is None:
+        return response
+
+    config = current_app.config
+    endpoint = request.endpoint or 'unknown'
+    threshold = config.get('SQL_NPLUSONE_THRESHOLD', 5)
+    repeated = recorder.repeated(threshold) if threshold else []
+    endpoint_stats.record(endpoint, recorder, repeated)
+
+    db_ms = recorder.seconds * 1000
+    response.headers['X-DB-Queries'] = str(recorder.count)
+    response.headers.add('Server-Timing', f'db;dur={db_ms:.3f};desc="{recorder.count} queries"')
+
+    action = config.get('SQL_NPLUSONE_ACTION', 'warn')
+    n_plus_one = repeated and action != 'ignore'
+    if n_plus_one or config.get('SQL_LOG_REQUESTS', False):
+        # Fields of the JSON log line (see logs.py), the message is for
+        # plain handlers
+        fields = {
+            'event': 'sql',
+            'endpoint': endpoint,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'db_ms': round(db_ms, 3),
+            'repeated': [{'fingerprint': key, 'count': count, 'sql': sql[:300]}
+                         for key, count, sql in repeated],
+        }
+        message = f'{request.method} {request.path}: {recorder.count} queries in {db_ms:.1f} ms'
+        logger = current_app.logger.getChild('sql')
+        if n_plus_one:
+            key, count, sql = repeated[0]
+            logger.warning('%s, N+1: %d x %s', message, count, sql[:300], extra={'fields': fields})
+        else:
+            logger.info(message, extra={'fields': fields})
+
+    if n_plus_one and action == 'raise':
+        key, count, sql = repeated[0]
+        raise NPlusOneError(f'{endpoint} ran the same statement {count} times: {sql[:300]}')
+    return response
+
+
+def init_instrumentation(app):
+    if not app.config.get('SQL_INSTRUMENTATION', True):
+        return
+    app.before_request(start_recording)
+    app.after_request(finish_recording)
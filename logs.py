@@ -0,0 +1,239 @@
+#------------------------------------------------------------------#
+# Imports
+#------------------------------------------------------------------#
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import (QueueHandler, QueueListener, RotatingFileHandler,
+                              TimedRotatingFileHandler, WatchedFileHandler)
+
+from flask import current_app, g, has_request_context, request
+from flask.logging import default_handler
+
+
+#------------------------------------------------------------------#
+# Logging pipeline
+#
+#   LOG_FILE = 'error.log'          None: write to stderr
+#   LOG_LEVEL = 'INFO'
+#   LOG_MAX_BYTES = 10485760        rotate the file at this size
+#   LOG_ROTATE_WHEN = None          'midnight', 'H', ...: rotate on time instead
+#   LOG_BACKUP_COUNT = 5            rotated files kept
+#   LOG_QUEUE_SIZE = 10000          records waiting to be written
+#   LOG_TRUST_REQUEST_ID = True     reuse the X-Request-ID of the proxy
+#
+# Rotation renames the file, which is only safe when a single process
+# writes it. A LOG_FILE holding {pid} ('logs/error-{pid}.log') gives
+# each worker its own file, rotated by the worker as set above. A file
+# shared by the workers is never rotated by the app: it is reopened when
+# an external tool (logrotate) moves it.
+#
+# A log call on a request thread only puts the record on a queue. A
+# listener thread per worker process formats the records as JSON lines
+# and writes them, so a slow disk never holds a request. When the queue
+# is full (the disk cannot keep up) records are dropped rather than
+# waited for, and the number dropped is logged once there is room.
+#
+# Every request gets an id, from the X-Request-ID header of the proxy
+# or a new one, sent back in X-Request-ID and added to the lines logged
+# while it is handled, along with the method and path.
+#------------------------------------------------------------------#
+REQUEST_ID_HEADER = 'X-Request-ID'
+VALID_REQUEST_ID = re.compile(r'^[A-Za-z0-9._:-]{1,64}$')
+REQUEST_FIELDS = ('request_id', 'method', 'path', 'remote_addr')
+
+
+#------------------------------------------------------------------#
+# Request ids
+#------------------------------------------------------------------#
+def assign_request_id():
+    incoming = request.headers.get(REQUEST_ID_HEADER, '')
+    if current_app.config.get('LOG_TRUST_REQUEST_ID', True) and VALID_REQUEST_ID.match(incoming):
+        g.request_id = incoming
+    else:
+        g.request_id = uuid.uuid4().hex
+
+
+def send_request_id(response):
+    request_id = g.get('request_id')
+    if request_id is not None:
+        response.headers[REQUEST_ID_HEADER] = request_id
+    return response
+
+
+# Runs on the thread that logs / copies the request fields to the record
+class RequestContextFilter(logging.Filter):
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.method = request.method
+            record.path = request.path
+            record.remote_addr = request.remote_addr
+        return True
+
+
+#------------------------------------------------------------------#
+# Records / one JSON object per line. Extra fields are passed as
+# logger.info(message, extra={'fields': {...}})
+#------------------------------------------------------------------#
+class JsonFormatter(logging.Formatter):
+
+    # The extra fields go first so they cannot replace the standard keys
+    def format(self, record):
+        entry = dict(getattr(record, 'fields', None) or {})
+        entry.update({
+            'time': datetime.fromtimestamp(record.created, timezone.utc)
+                            .isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'source': f'{record.pathname}:{record.lineno}',
+            'pid': record.process,
+        })
+        for field in REQUEST_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = record.stack_info
+        return json.dumps(entry, default=str)
+
+
+# Puts the records on the queue without ever waiting for room
+class NonBlockingQueueHandler(QueueHandler):
+
+    def __init__(self, records):
+        super().__init__(records)
+        self.drop_lock = threading.Lock()
+        self.dropped = 0
+
+    # Resolve on the logging thread what cannot cross the queue: the
+    # message arguments and the traceback
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self.drop_lock:
+                self.dropped += 1
+            return
+        if self.dropped:
+            with self.drop_lock:
+                dropped, self.dropped = self.dropped, 0
+            notice = logging.makeLogRecord({
+                'name': record.name, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                'msg': f'{dropped} log records dropped: the log queue was full',
+            })
+            try:
+                self.queue.put_nowait(notice)
+            except queue.Full:
+                with self.drop_lock:
+                    self.dropped += dropped
+
+
+#------------------------------------------------------------------#
+# Queue and listener thread / the thread does not survive a fork,
+# so a worker forked by a preloading server starts its own
+#------------------------------------------------------------------#
+def output_handler(config):
+    path = config.get('LOG_FILE', 'error.log')
+    if not path:
+        return logging.StreamHandler()
+    if '{pid}' not in path:
+        return WatchedFileHandler(path, encoding='utf-8', delay=True)
+    path = path.format(pid=os.getpid())
+    if config.get('LOG_ROTATE_WHEN'):
+        return TimedRotatingFileHandler(path, when=config['LOG_ROTATE_WHEN'],
+          backupCount=config.get('LOG_BACKUP_COUNT', 5), encoding='utf-8', delay=True)
+    return RotatingFileHandler(path, maxBytes=config.get('LOG_MAX_BYTES', 10 * 1024 * 1024),
+      backupCount=config.get('LOG_BACKUP_COUNT', 5), encoding='utf-8', delay=True)
+
+
+class LogPipeline:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.handler = None
+        self.output = None
+        self.listener = None
+        self.config = {}
+
+    def start(self, app):
+        with self.lock:
+            if self.handler is None:
+                self.config = {key: value for key, value in app.config.items()
+                               if key.startswith('LOG_')}
+                self.output = self.open_output()
+                self.handler = NonBlockingQueueHandler(self.new_queue())
+                self.handler.addFilter(RequestContextFilter())
+                self.listen()
+                atexit.register(self.stop)
+                os.register_at_fork(after_in_child=self.restart)
+
+        # Only the queue handler writes for the app logger
+        app.logger.removeHandler(default_handler)
+        if self.handler not in app.logger.handlers:
+            app.logger.addHandler(self.handler)
+        app.logger.setLevel(app.config.get('LOG_LEVEL', 'INFO'))
+
+    def new_queue(self):
+        return queue.Queue(self.config.get('LOG_QUEUE_SIZE', 10000))
+
+    def open_output(self):
+        output = output_handler(self.config)
+        output.setFormatter(JsonFormatter())
+        return output
+
+    def listen(self):
+        self.listener = QueueListener(self.handler.queue, self.output, respect_handler_level=True)
+        self.listener.start()
+
+    # In a forked worker / a new queue, since a thread of the parent may
+    # have held the lock of the old one, and the file of this worker
+    def restart(self):
+        if self.handler is None:
+            return
+        self.output.close()
+        self.output = self.open_output()
+        self.handler.queue = self.new_queue()
+        self.listen()
+
+    # Write what is still queued at exit
+    def stop(self):
+        listener, self.listener = self.listener, None
+        if listener is None or listener._thread is None:
+            return
+        try:
+            listener.stop()
+        except queue.Full:
+            pass
+
+
+log_pipeline = LogPipeline()
+
+
+def init_logging(app):
+    app.before_request(assign_request_id)
+    app.after_request(send_request_id)
+    if not app.debug and not app.testing:
+        log_pipeline.start(app)
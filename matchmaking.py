@@ -0,0 +1,333 @@
+#------------------------------------------------------------------#
+# Imports
+#------------------------------------------------------------------#
+import threading
+import time
+from collections import defaultdict
+
+from flask import current_app
+
+# Import user defined module
+from models import db, Artist, Venue, Show
+from geo import place_key
+from session_changes import subscribe_changes
+
+
+#------------------------------------------------------------------#
+# Artist / venue matchmaking
+#
+#   MATCH_RESULT_LIMIT = 10       recommendations per profile
+#   MATCH_INDEX_MAX_AGE = 300     seconds before an index is rebuilt
+#
+# Venues are recommended to an artist, and artists to a venue, among
+# the profiles seeking the other side that share a genre or the city.
+# Each shared genre, the same city or state and earlier shows together
+# add to the score (MATCH_WEIGHTS).
+#
+# Every model has an in-process inverted index from genre and state to
+# bitsets (Python ints, one bit per row), and from city to the positions
+# of its rows (thousands of table-long city bitsets would not fit). The
+# scores of all rows are summed with bitwise adders and read from the
+# highest down, so a recommendation costs a few dozen big-int operations
+# whatever the number of rows, plus one indexed query for earlier shows.
+#
+# Committed changes are applied to the indexes of this process; other
+# workers pick them up when their index reaches MATCH_INDEX_MAX_AGE.
+#------------------------------------------------------------------#
+MATCH_WEIGHTS = {'genre': 3, 'city': 2, 'state': 1, 'played': 2}
+
+# Flag of the rows looking for the other side
+SEEKING_COLUMNS = {Artist: 'seeking_venue', Venue: 'seeking_artist'}
+
+
+# Bitset of positions / built in a buffer, setting bits of an int one
+# at a time would copy the whole int every time
+def to_bits(positions):
+    positions = list(positions)
+    if not positions:
+        return 0
+    buffer = bytearray(max(positions) // 8 + 1)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+# Positions of the set bits, lowest first
+def bit_positions(bits):
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+# Add weight to the score of the rows in bits / planes[j] holds bit j
+# of the score of every row (a bit-sliced counter)
+def add_score(planes, bits, weight):
+    plane = 0
+    while weight:
+        if weight & 1:
+            carry, j = bits, plane
+            while carry:
+                if j == len(planes):
+                    planes.append(0)
+                planes[j], carry = planes[j] ^ carry, planes[j] & carry
+                j += 1
+        weight >>= 1
+        plane += 1
+
+
+# (score, position) of the best limit candidates, highest score first
+def top_scores(planes, candidates, limit):
+    results = []
+    for score in range((1 << len(planes)) - 1, 0, -1):
+        members = candidates
+        for j, plane in enumerate(planes):
+            members &= plane if score >> j & 1 else ~plane
+            if not members:
+                break
+        for position in bit_positions(members):
+            results.append((score, position))
+            if len(results) == limit:
+                return results
+        candidates &= ~members
+        if not candidates:
+            break
+    return results
+
+
+class MatchIndex:
+
+    # Held while a committed change is applied and while match() reads
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.built = time.monotonic()
+        self.positions = {}
+        self.ids = []
+        self.entries = {}
+        self.genres = defaultdict(int)
+        self.cities = defaultdict(set)
+        self.states = defaultdict(int)
+        self.seeking = 0
+
+    # Fill an empty index from (id, genres, city, state, seeking) rows
+    def load(self, rows):
+        genres, states, seeking = defaultdict(list), defaultdict(list), []
+        for row_id, row_genres, city, state, row_seeking in rows:
+            position = self.positions[row_id] = len(self.ids)
+            self.ids.append(row_id)
+            row_genres = tuple(row_genres or ())
+            area = (place_key(city), (state or '').upper())
+            for genre in row_genres:
+                genres[genre].append(position)
+            self.cities[area].add(position)
+            states[area[1]].append(position)
+            if row_seeking:
+                seeking.append(position)
+            self.entries[row_id] = (row_genres, area, bool(row_seeking))
+
+        for genre, positions in genres.items():
+            self.genres[genre] = to_bits(positions)
+        for state, positions in states.items():
+            self.states[state] = to_bits(positions)
+        self.seeking = to_bits(seeking)
+
+    # One row written after the load
+    def add(self, row_id, genres, city, state, seeking):
+        self.remove(row_id)
+        position = self.positions.get(row_id)
+        if position is None:
+            position = self.positions[row_id] = len(self.ids)
+            self.ids.append(row_id)
+        bit = 1 << position
+
+        genres = tuple(genres or ())
+        area = (place_key(city), (state or '').upper())
+        for genre in genres:
+            self.genres[genre] |= bit
+        self.cities[area].add(position)
+        self.states[area[1]] |= bit
+        if seeking:
+            self.seeking |= bit
+        self.entries[row_id] = (genres, area, bool(seeking))
+
+    def remove(self, row_id):
+        entry = self.entries.pop(row_id, None)
+        if entry is None:
+            return
+        genres, area, seeking = entry
+        position = self.positions[row_id]
+        mask = ~(1 << position)
+        for genre in genres:
+            self.genres[genre] &= mask
+        self.cities[area].discard(position)
+        self.states[area[1]] &= mask
+        if seeking:
+            self.seeking &= mask
+
+    def bits(self, ids):
+        return to_bits(self.positions[row_id] for row_id in ids if row_id in self.entries)
+
+    # Best (score, id) for a profile with these genres and area, boosting
+    # the ids in played / only the rows seeking the other side
+    def match(self, genres, city, state, played, limit):
+        area = (place_key(city), (state or '').upper())
+
+        # Read a consistent snapshot / the bitsets are immutable ints, the
+        # city sets are turned into bitsets before a write can change them
+        # (ids is only appended to, so the positions read stay valid)
+        with self.lock:
+            genre_bits = [self.genres.get(genre, 0) for genre in set(genres or ())]
+            city_bits = to_bits(self.cities.get(area, ()))
+            state_bits = self.states.get(area[1], 0)
+            played_bits = self.bits(played)
+            seeking = self.seeking
+
+        planes = []
+        shared = 0
+        for bits in genre_bits:
+            add_score(planes, bits, MATCH_WEIGHTS['genre'])
+            shared |= bits
+        add_score(planes, city_bits, MATCH_WEIGHTS['city'])
+        add_score(planes, state_bits, MATCH_WEIGHTS['state'])
+        add_score(planes, played_bits, MATCH_WEIGHTS['played'])
+
+        candidates = seeking & (shared | city_bits)
+        return [(score, self.ids[position])
+                for score, position in top_scores(planes, candidates, limit)]
+
+
+#------------------------------------------------------------------#
+# Indexes per app and model
+#------------------------------------------------------------------#
+class Matchmaker:
+
+    def __init__(self):
+        self.indexes = {}
+        # Changes committed while an index is built, by (app, model)
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+
+    def build(self, model):
+        index = MatchIndex()
+        index.load(db.session.query(model.id, model.genres, model.city, model.state,
+          getattr(model, SEEKING_COLUMNS[model])).order_by(model.id).yield_per(10000))
+        return index
+
+    # Index of a model, built on first use and again once too old / while
+    # one request rebuilds it, the others keep using the old one. The
+    # changes committed while the rows load are kept and replayed on the
+    # new index before it replaces the old one (replaying a change the
+    # load already read does no harm)
+    def index(self, model):
+        app = current_app._get_current_object()
+        key = (app, model)
+        index = self.indexes.get(key)
+        if index is not None and \
+           time.monotonic() - index.built <= app.config.get('MATCH_INDEX_MAX_AGE', 300):
+            return index
+        if not self.build_lock.acquire(blocking=index is None):
+            return index
+        try:
+            # Built by another request while this one waited
+            current = self.indexes.get(key)
+            if current is not None and current is not index:
+                return current
+            with self.lock:
+                self.pending[key] = []
+            try:
+                index = self.build(model)
+            except BaseException:
+                with self.lock:
+                    del self.pending[key]
+                raise
+            with self.lock:
+                self.replay(index, model, self.pending.pop(key))
+                self.indexes[key] = index
+            return index
+        finally:
+            self.build_lock.release()
+
+    # Drop the indexes / rows were written without the session
+    def invalidate(self, model=None):
+        with self.lock:
+            for key in list(self.indexes):
+                if model is None or key[1] is model:
+                    del self.indexes[key]
+
+    # Each change is (model, id, (genres, city, state, seeking) or None)
+    def apply(self, changes):
+        with self.lock:
+            for (app, model), index in self.indexes.items():
+                self.replay(index, model, changes)
+            for buffered in self.pending.values():
+                buffered.extend(changes)
+
+    def replay(self, index, model, changes):
+        with index.lock:
+            for changed, row_id, values in changes:
+                if changed is not model:
+                    continue
+                if values is None:
+                    index.remove(row_id)
+                else:
+                    index.add(row_id, *values)
+
+
+matchmaker = Matchmaker()
+
+
+#------------------------------------------------------------------#
+# Recommendations / venues for an artist, artists for a venue
+#------------------------------------------------------------------#
+
+# Model to recommend, then the show columns of the profile and of a match
+def other_side(profile):
+    if isinstance(profile, Artist):
+        return Venue, Show.artist_id, Show.venue_id
+    return Artist, Show.venue_id, Show.artist_id
+
+
+# Best matches of a profile in score order, with why they match
+def recommendations(profile, limit=None):
+    model, own_column, other_column = other_side(profile)
+    played = {row[0] for row in db.session.query(other_column)
+              .filter(own_column == profile.id).distinct()}
+    limit = limit or current_app.config.get('MATCH_RESULT_LIMIT', 10)
+    matches = matchmaker.index(model).match(profile.genres, profile.city, profile.state,
+      played, limit)
+    if not matches:
+        return []
+
+    rows = db.session.query(model.id, model.name, model.city, model.state,
+      model.genres, model.image_link).filter(model.id.in_([row_id for score, row_id in matches]))
+    rows = {row.id: row for row in rows}
+    genres = set(profile.genres or ())
+    area = (place_key(profile.city), (profile.state or '').upper())
+    results = []
+    for score, row_id in matches:
+        row = rows.get(row_id)
+        if row is None:
+            continue
+        results.append({
+            'id': row.id,
+            'name': row.name,
+            'city': row.city,
+            'state': row.state,
+            'image_link': row.image_link,
+            'score': score,
+            'shared_genres': [genre for genre in row.genres or () if genre in genres],
+            'same_city': (place_key(row.city), (row.state or '').upper()) == area,
+            'played_before': row.id in played,
+        })
+    return results
+
+
+# Keep the in-process indexes in step with committed changes
+#------------------------------------------------------------------#
+def match_values(instance):
+    return (list(instance.genres or ()), instance.city, instance.state,
+            getattr(instance, SEEKING_COLUMNS[type(instance)]))
+
+
+subscribe_changes(SEEKING_COLUMNS, match_values, matchmaker.apply)
@@ -0,0 +1,39 @@
+"""add show and listing indexes
+
+Revision ID: 8c4d2b6e1a90
+Revises: 5a1f3c2e9b7d
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4d2b6e1a90'
+down_revision = '5a1f3c2e9b7d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Profile pages: shows of one artist / venue within a start_time range
+    op.create_index('ix_shows_venue_id_start_time', 'shows', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_shows_artist_id_start_time', 'shows', ['artist_id', 'start_time'], unique=False)
+    # /shows listing: keyset pagination over (start_time, id)
+    op.create_index('ix_shows_start_time_id', 'shows', ['start_time', 'id'], unique=False)
+    # /venues listing and location / name lookups
+    op.create_index('ix_venues_city_state_name', 'venues', ['city', 'state', 'name'], unique=False)
+    op.create_index('ix_venues_name', 'venues', ['name'], unique=False)
+    op.create_index('ix_artists_city_state', 'artists', ['city', 'state'], unique=False)
+    op.create_index('ix_artists_name', 'artists', ['name'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_artists_name', table_name='artists')
+    op.drop_index('ix_artists_city_state', table_name='artists')
+    op.drop_index('ix_venues_name', table_name='venues')
+    op.drop_index('ix_venues_city_state_name', table_name='venues')
+    op.drop_index('ix_shows_start_time_id', table_name='shows')
+    op.drop_index('ix_shows_artist_id_start_time', table_name='shows')
+    op.drop_index('ix_shows_venue_id_start_time', table_name='shows')
@@ -0,0 +1,32 @@
+"""add BRIN index on show start times
+
+Revision ID: a4e8d05b7c19
+Revises: f1c7a2d94e60
+Create Date: 2026-10-18 17:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4e8d05b7c19'
+down_revision = 'f1c7a2d94e60'
+branch_labels = None
+depends_on = None
+
+
+# Shows are mostly added in start_time order, so a BRIN index stays a few
+# pages for years of history. Calendar queries filtered by city combine it
+# with ix_shows_venue_id_start_time in a bitmap scan; unfiltered pages walk
+# ix_shows_start_time_id. Postgres only
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE INDEX ix_shows_start_time_brin ON shows USING brin (start_time)')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('DROP INDEX ix_shows_start_time_brin')
@@ -0,0 +1,45 @@
+"""add trigram search indexes
+
+Revision ID: b7e9a4d3c215
+Revises: 8c4d2b6e1a90
+Create Date: 2026-10-18 10:15:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e9a4d3c215'
+down_revision = '8c4d2b6e1a90'
+branch_labels = None
+depends_on = None
+
+
+# Trigram and array indexes only exist on Postgres / SQLite uses the
+# in-process n-gram index of the search package instead
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('artists', 'venues'):
+        op.execute(
+            f'CREATE INDEX ix_{table}_name_trgm ON {table} '
+            f'USING gin (name gin_trgm_ops)'
+        )
+        op.execute(
+            f"CREATE INDEX ix_{table}_location_trgm ON {table} "
+            f"USING gin ((city || ', ' || state) gin_trgm_ops)"
+        )
+        op.execute(f'CREATE INDEX ix_{table}_genres ON {table} USING gin (genres)')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table in ('artists', 'venues'):
+        op.execute(f'DROP INDEX IF EXISTS ix_{table}_genres')
+        op.execute(f'DROP INDEX IF EXISTS ix_{table}_location_trgm')
+        op.execute(f'DROP INDEX IF EXISTS ix_{table}_name_trgm')
@@ -0,0 +1,46 @@
+"""add venue coordinates and places
+
+Revision ID: c3b9f6e2d518
+Revises: a4e8d05b7c19
+Create Date: 2026-10-18 18:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3b9f6e2d518'
+down_revision = 'a4e8d05b7c19'
+branch_labels = None
+depends_on = None
+
+
+# Coordinates are filled by `flask geo load` then `flask geo backfill`
+def upgrade():
+    op.create_table('places',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('city', sa.String(length=120), nullable=False),
+    sa.Column('state', sa.String(length=2), nullable=False),
+    sa.Column('city_key', sa.String(length=120), nullable=False),
+    sa.Column('latitude', sa.Float(), nullable=False),
+    sa.Column('longitude', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('state', 'city_key', name='uq_places_state_city_key')
+    )
+
+    with op.batch_alter_table('venues') as batch_op:
+        batch_op.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('geohash', sa.String(length=12), nullable=True))
+        batch_op.create_index('ix_venues_geohash', ['geohash'])
+
+
+def downgrade():
+    with op.batch_alter_table('venues') as batch_op:
+        batch_op.drop_index('ix_venues_geohash')
+        batch_op.drop_column('geohash')
+        batch_op.drop_column('longitude')
+        batch_op.drop_column('latitude')
+
+    op.drop_table('places')
@@ -0,0 +1,36 @@
+"""add updated_at columns
+
+Revision ID: d2f6c81b4e37
+Revises: b7e9a4d3c215
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f6c81b4e37'
+down_revision = 'b7e9a4d3c215'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('artists', 'venues', 'shows'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=False,
+              server_default=sa.text("'1970-01-01 00:00:00'")))
+    op.execute('UPDATE artists SET updated_at = CURRENT_TIMESTAMP')
+    op.execute('UPDATE venues SET updated_at = CURRENT_TIMESTAMP')
+    op.execute('UPDATE shows SET updated_at = CURRENT_TIMESTAMP')
+    op.create_index('ix_artists_updated_at', 'artists', ['updated_at'], unique=False)
+    op.create_index('ix_venues_updated_at', 'venues', ['updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_venues_updated_at', table_name='venues')
+    op.drop_index('ix_artists_updated_at', table_name='artists')
+    for table in ('shows', 'venues', 'artists'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('updated_at')
@@ -0,0 +1,51 @@
+"""add show counters
+
+Revision ID: e5a93f7c0d28
+Revises: d2f6c81b4e37
+Create Date: 2026-10-18 11:45:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a93f7c0d28'
+down_revision = 'd2f6c81b4e37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('artists', 'venues'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('upcoming_shows_count', sa.Integer(), nullable=False, server_default='0'))
+            batch_op.add_column(sa.Column('past_shows_count', sa.Integer(), nullable=False, server_default='0'))
+
+    op.create_table('counter_state',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rolled_until', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    # Backfill the counters relative to the same watermark the app uses
+    now = datetime.now()
+    for table, key in (('artists', 'artist_id'), ('venues', 'venue_id')):
+        op.get_bind().execute(sa.text(
+            f'UPDATE {table} SET '
+            f'past_shows_count = (SELECT count(*) FROM shows WHERE shows.{key} = {table}.id AND shows.start_time <= :now), '
+            f'upcoming_shows_count = (SELECT count(*) FROM shows WHERE shows.{key} = {table}.id AND shows.start_time > :now)'
+        ), {'now': now})
+    op.get_bind().execute(sa.text(
+        'INSERT INTO counter_state (id, rolled_until) VALUES (1, :now)'
+    ), {'now': now})
+
+
+def downgrade():
+    op.drop_table('counter_state')
+    for table in ('venues', 'artists'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('past_shows_count')
+            batch_op.drop_column('upcoming_shows_count')
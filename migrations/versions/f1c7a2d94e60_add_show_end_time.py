@@ -0,0 +1,85 @@
+"""add show end time and booking constraints
+
+Revision ID: f1c7a2d94e60
+Revises: e5a93f7c0d28
+Create Date: 2026-10-18 16:30:00.000000
+
+"""
+from datetime import timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c7a2d94e60'
+down_revision = 'e5a93f7c0d28'
+branch_labels = None
+depends_on = None
+
+
+# Same default as models.DEFAULT_SHOW_DURATION at the time of writing
+DEFAULT_DURATION = timedelta(minutes=120)
+
+
+# Existing shows get the default duration, cut short where the next show of
+# the same artist or venue starts, so the exclusion constraints accept them
+def backfill_end_times(bind):
+    next_start = {}
+    ends = {}
+    shows = sa.table('shows', sa.column('id', sa.Integer), sa.column('artist_id', sa.Integer),
+                     sa.column('venue_id', sa.Integer), sa.column('start_time', sa.DateTime),
+                     sa.column('end_time', sa.DateTime))
+    rows = bind.execute(
+        sa.select(shows.c.id, shows.c.artist_id, shows.c.venue_id, shows.c.start_time)
+        .order_by(shows.c.start_time.desc(), shows.c.id.desc())
+    )
+    for show_id, artist_id, venue_id, start_time in rows:
+        end_time = start_time + DEFAULT_DURATION
+        for key in (('artist', artist_id), ('venue', venue_id)):
+            if key in next_start:
+                end_time = min(end_time, next_start[key])
+            next_start[key] = start_time
+        ends[show_id] = end_time
+
+    update = shows.update().where(shows.c.id == sa.bindparam('show_id'))\
+        .values(end_time=sa.bindparam('show_end'))
+    batch = []
+    for show_id, end_time in ends.items():
+        batch.append({'show_id': show_id, 'show_end': end_time})
+        if len(batch) == 5000:
+            bind.execute(update, batch)
+            batch = []
+    if batch:
+        bind.execute(update, batch)
+
+
+def upgrade():
+    bind = op.get_bind()
+    with op.batch_alter_table('shows') as batch_op:
+        batch_op.add_column(sa.Column('end_time', sa.DateTime(), nullable=True))
+
+    backfill_end_times(bind)
+
+    with op.batch_alter_table('shows') as batch_op:
+        batch_op.alter_column('end_time', existing_type=sa.DateTime(), nullable=False)
+        batch_op.create_check_constraint('ck_shows_end_after_start', 'end_time >= start_time')
+
+    # An artist or a venue cannot be booked twice at the same time
+    if bind.dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        for key in ('venue', 'artist'):
+            op.execute(
+                f'ALTER TABLE shows ADD CONSTRAINT ex_shows_{key}_booking '
+                f'EXCLUDE USING gist ({key}_id WITH =, tsrange(start_time, end_time) WITH &&)'
+            )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for key in ('artist', 'venue'):
+            op.execute(f'ALTER TABLE shows DROP CONSTRAINT ex_shows_{key}_booking')
+
+    with op.batch_alter_table('shows') as batch_op:
+        batch_op.drop_constraint('ck_shows_end_after_start', type_='check')
+        batch_op.drop_column('end_time')
@@ -1,12 +1,49 @@
 #------------------------------------------------------------------#
 # Imports
 #------------------------------------------------------------------#
-from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from flask import current_app
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import raiseload
+from datetime import datetime, timedelta
+
+# SQLAlchemy with a session that can read from replicas (see routing.py)
+from routing import SQLAlchemy
 
 # Define db object
 db = SQLAlchemy()
 
+# Genres are stored as a Postgres ARRAY / JSON is used on SQLite so the app,
+# the benchmarks and local experiments can run without a Postgres server.
+# The dialect ARRAY, since only it has the contains() / overlap() operators
+GenreList = ARRAY(db.String).with_variant(db.JSON, 'sqlite')
+
+
+# N+1 guard / relationships are loaded per query with explicit options.
+# Views add these options so any relationship left to lazy loading raises
+# instead of issuing one query per row (SQLALCHEMY_RAISELOAD, on in debug)
+def strict_loading():
+    if current_app.config.get('SQLALCHEMY_RAISELOAD', current_app.debug):
+        return [raiseload('*')]
+    return []
+
+
+# Rows whose genres column holds a genre / array containment (GIN
+# indexed) on Postgres, a match in the JSON text elsewhere
+def has_genre(column, genre):
+    if db.engine.dialect.name == 'postgresql':
+        return column.contains([genre])
+    return db.cast(column, db.String).like(f'%"{genre}"%')
+
+
+# Mark rows as changed when data they display is written elsewhere
+# (a profile page lists show, artist and venue details) / call before commit
+def touch(model, ids):
+    ids = list(ids)
+    if ids:
+        db.session.query(model).filter(model.id.in_(ids))\
+          .update({model.updated_at: datetime.utcnow()}, synchronize_session=False)
+
+
 #------------------------------------------------------------------#
 # Models.
 #------------------------------------------------------------------#
@@ -14,6 +51,18 @@ db = SQLAlchemy()
 
 # Many to many relationship -- Association table
 #------------------------------------------------------------------#
+
+# Length of a show in minutes when none is given, and the longest allowed /
+# the maximum bounds the index range scanned for conflicts (see booking.py)
+DEFAULT_SHOW_DURATION = 120
+MAX_SHOW_DURATION = 24 * 60
+
+
+def default_end_time(context):
+    start_time = context.get_current_parameters().get('start_time') or datetime.utcnow()
+    return start_time + timedelta(minutes=DEFAULT_SHOW_DURATION)
+
+
 class Show(db.Model):
     __tablename__ = 'shows'
 
@@ -21,11 +70,42 @@ class Show(db.Model):
     artist_id =  db.Column(db.Integer, db.ForeignKey('artists.id'), nullable=False)
     venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'), nullable=False)
     start_time = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # The show occupies its artist and venue over [start_time, end_time)
+    end_time = db.Column(db.DateTime, nullable=False, default=default_end_time)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Profile pages filter on artist / venue with a start_time range and the
+    # /shows listing pages through (start_time, id). The first two also
+    # serve the double-booking checks; Postgres enforces them with
+    # exclusion constraints added by the migrations
+    __table_args__ = (
+        db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_shows_start_time_id', 'start_time', 'id'),
+        db.CheckConstraint('end_time >= start_time', name='ck_shows_end_after_start'),
+    )
+
+    @property
+    def duration(self):
+      return int((self.end_time - self.start_time).total_seconds() // 60)
 
     def __repr__(self):
       return f'<Show {self.id}, Artist {self.artist_id}, Venue {self.venue_id}>'
 
 
+# Show counters state
+#------------------------------------------------------------------#
+class CounterState(db.Model):
+    __tablename__ = 'counter_state'
+
+    # Single row / shows starting up to rolled_until are counted as past
+    id = db.Column(db.Integer, primary_key=True)
+    rolled_until = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+      return f'<CounterState rolled until {self.rolled_until}>'
+
+
 # Venue Model
 #------------------------------------------------------------------#
 class Venue(db.Model):
@@ -40,17 +120,53 @@ class Venue(db.Model):
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     # Missing model properties
-    genres = db.Column('genres', db.ARRAY(db.String()), nullable=False)
+    genres = db.Column('genres', GenreList, nullable=False)
     website_link = db.Column(db.String(400))
     seeking_artist =db.Column(db.Boolean, default=True)
     seeking_description = db.Column(db.String(400), default='We are searching for a new artist')
+    # Maintained by counters.py
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # Set from the places table when the city changes (see geo.py)
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geohash = db.Column(db.String(12))
     
     # To generate a new relationship
-    shows = db.relationship('Show', backref='venue', lazy='joined', cascade="all, delete")
+    shows = db.relationship('Show', backref='venue', cascade="all, delete")
+
+    # The /venues listing groups by (city, state) and orders by name
+    __table_args__ = (
+        db.Index('ix_venues_city_state_name', 'city', 'state', 'name'),
+        db.Index('ix_venues_name', 'name'),
+        # Venues near a point are read by geohash prefix ranges
+        db.Index('ix_venues_geohash', 'geohash'),
+    )
 
     def __repr__(self):
       return f'<Venue {self.id} name: {self.name}>'
 
+# Offline geocoding table / one row per city, loaded with `flask geo load`
+#------------------------------------------------------------------#
+class Place(db.Model):
+    __tablename__ = 'places'
+
+    id = db.Column(db.Integer, primary_key=True)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(2), nullable=False)
+    # Lower case city with single spaces / the lookup key
+    city_key = db.Column(db.String(120), nullable=False)
+    latitude = db.Column(db.Float, nullable=False)
+    longitude = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('state', 'city_key', name='uq_places_state_city_key'),
+    )
+
+    def __repr__(self):
+      return f'<Place {self.city}, {self.state}>'
+
 # Artist Model
 #-----------------------------------------------------------------#
 class Artist(db.Model):
@@ -61,16 +177,26 @@ class Artist(db.Model):
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column('genres', db.ARRAY(db.String), nullable=False)
+    genres = db.Column('genres', GenreList, nullable=False)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     # Missing model properties
     website_link = db.Column(db.String(400))
     seeking_venue = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.String(400), default='Searching for shows to perform')
+    # Maintained by counters.py
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     # Generate a new relationship
-    shows = db.relationship('Show', backref='artist', lazy='joined', cascade="all, delete")
+    shows = db.relationship('Show', backref='artist', cascade="all, delete")
+
+    # Searching artists by city and state / by name
+    __table_args__ = (
+        db.Index('ix_artists_city_state', 'city', 'state'),
+        db.Index('ix_artists_name', 'name'),
+    )
 
     def __repr__(self):
       return f'<Artist {self.id} name: {self.name}>'
\ No newline at end of file
@@ -0,0 +1,73 @@
+#------------------------------------------------------------------#
+# Imports
+#------------------------------------------------------------------#
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+
+#------------------------------------------------------------------#
+# Keyset (cursor) pagination helpers
+#
+# A cursor is an opaque, url-safe token holding the sort key of the
+# last row of a page. The next page continues strictly after that key,
+# so every page costs the same index range scan however deep it is.
+#------------------------------------------------------------------#
+
+# Encode the sort key of the last row on a page
+def encode_cursor(*values):
+    payload = [value.isoformat() if isinstance(value, datetime) else value
+               for value in values]
+    token = base64.urlsafe_b64encode(json.dumps(payload).encode())
+    return token.decode().rstrip('=')
+
+
+# Decode a cursor / each value is converted with the matching type
+# Raises ValueError when the token is malformed
+def decode_cursor(token, *types):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (TypeError, ValueError) as error:
+        raise ValueError('Invalid cursor') from error
+
+    if not isinstance(payload, list) or len(payload) != len(types):
+        raise ValueError('Invalid cursor')
+
+    # Well formed JSON can still hold values of the wrong type ([1, "x"])
+    values = []
+    try:
+        for kind, value in zip(types, payload):
+            if kind is datetime:
+                value = datetime.fromisoformat(value)
+            else:
+                value = kind(value)
+            values.append(value)
+    except (TypeError, ValueError) as error:
+        raise ValueError('Invalid cursor') from error
+    return tuple(values)
+
+
+# Filter rows whose sort key comes strictly after the cursor values
+def after_cursor(query, columns, values):
+    return query.filter(tuple_(*columns) > tuple_(*values))
+
+
+# Read a page size from the query string, bounded by the maximum
+def parse_limit(value, default, maximum):
+    try:
+        limit = int(value) if value else default
+    except ValueError:
+        limit = default
+    return max(1, min(limit, maximum))
+
+
+# Fetch one page / returns (rows, next cursor or None)
+def fetch_page(query, limit, cursor_key):
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*cursor_key(rows[-1]))
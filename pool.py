@@ -0,0 +1,149 @@
+#------------------------------------------------------------------#
+# Imports
+#------------------------------------------------------------------#
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool, QueuePool
+
+# Import user defined module
+from models import db
+
+
+#------------------------------------------------------------------#
+# Pools that time how long callers wait for a connection
+#------------------------------------------------------------------#
+class WaitTimer:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        with self.lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'checkouts': self.count,
+                'wait_ms_total': round(self.total * 1000, 3),
+                'wait_ms_avg': round(self.total * 1000 / self.count, 3) if self.count else 0.0,
+                'wait_ms_max': round(self.max * 1000, 3),
+            }
+
+
+# _do_get is where a pool hands out a connection, blocking when the
+# pool and its overflow are exhausted (and connecting for a NullPool)
+class TimedPoolMixin:
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_timer = WaitTimer()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.wait_timer.record(time.perf_counter() - start)
+
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedNullPool(TimedPoolMixin, NullPool):
+    pass
+
+
+#------------------------------------------------------------------#
+# Engine options from config
+#
+#   DB_POOL_SIZE = 5              connections kept open per process
+#   DB_MAX_OVERFLOW = 10          extra connections allowed under load
+#   DB_POOL_TIMEOUT = 30          seconds to wait for a free connection
+#   DB_POOL_RECYCLE = 1800        reopen connections older than this
+#   DB_POOL_PRE_PING = True       test connections when checked out
+#   DB_STATEMENT_TIMEOUT = None   Postgres statement_timeout in ms
+#   DB_PGBOUNCER = False          PgBouncer in transaction pooling mode
+#
+# Only applied to Postgres; SQLite keeps Flask-SQLAlchemy's pools.
+# Anything set in SQLALCHEMY_ENGINE_OPTIONS takes precedence.
+#------------------------------------------------------------------#
+def engine_options(config, uri):
+    if make_url(uri).get_backend_name() != 'postgresql':
+        return {}
+
+    timeout = config.get('DB_STATEMENT_TIMEOUT')
+
+    # PgBouncer does the pooling: open a connection per checkout and let
+    # it go right after. Startup 'options' are rejected by PgBouncer, so
+    # the statement timeout is set per transaction (see init_pool)
+    if config.get('DB_PGBOUNCER', False):
+        return {'poolclass': TimedNullPool}
+
+    options = {
+        'poolclass': TimedQueuePool,
+        'pool_size': config.get('DB_POOL_SIZE', 5),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+    }
+    if timeout:
+        options['connect_args'] = {'options': f'-c statement_timeout={int(timeout)}'}
+    return options
+
+
+# Call before db.init_app
+def init_pool(app):
+    options = engine_options(app.config, app.config.get('SQLALCHEMY_DATABASE_URI') or 'sqlite://')
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+# Call after db.init_app / the engines are created here rather than on
+# the first request so the listener is in place before any transaction.
+# Every bind gets it: reads routed to a replica are bounded too
+def init_statement_timeout(app):
+    timeout = app.config.get('DB_STATEMENT_TIMEOUT')
+    if not (timeout and app.config.get('DB_PGBOUNCER', False)):
+        return
+
+    statement = f'SET LOCAL statement_timeout = {int(timeout)}'
+
+    def set_statement_timeout(connection):
+        connection.exec_driver_sql(statement)
+
+    for bind in [None, *(app.config.get('SQLALCHEMY_BINDS') or {})]:
+        engine = db.get_engine(app, bind=bind)
+        if engine.dialect.name == 'postgresql':
+            event.listen(engine, 'begin', set_statement_timeout)
+
+
+#------------------------------------------------------------------#
+# Pool stats / per process: each worker has its own pool
+#------------------------------------------------------------------#
+def pool_stats(engine):
+    pool = engine.pool
+    stats = {'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            # overflow() counts down from -size while the pool fills up
+            'overflow': max(pool.overflow(), 0),
+            'max_overflow': pool._max_overflow,
+        })
+    timer = getattr(pool, 'wait_timer', None)
+    if timer is not None:
+        stats.update(timer.snapshot())
+    return stats
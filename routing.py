@@ -0,0 +1,148 @@
+#------------------------------------------------------------------#
+# Imports
+#------------------------------------------------------------------#
+import random
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy import SQLAlchemy as BaseSQLAlchemy, SignallingSession, get_state
+from sqlalchemy import event, orm, text
+from sqlalchemy.sql.dml import UpdateBase
+
+
+#------------------------------------------------------------------#
+# Read replicas
+#
+#   SQLALCHEMY_REPLICA_URIS = []     one URI per replica
+#   REPLICA_MAX_LAG = 5              seconds; lagging replicas are skipped
+#   REPLICA_LAG_CHECK_INTERVAL = 5   seconds between lag checks
+#   REPLICA_STICKY_SECONDS = 10      reads stay on the primary after a write
+#
+# Replicas are Flask-SQLAlchemy binds named replica_0, replica_1, ...
+# Views marked with read_only run their reads on a replica; everything
+# else, and any flush or INSERT/UPDATE/DELETE, goes to the primary.
+#------------------------------------------------------------------#
+STICKY_COOKIE = 'fyyur_primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+# Session that sends reads to the replica chosen for the request
+class RoutingSession(SignallingSession):
+
+    def get_bind(self, mapper=None, clause=None):
+        bind = g.get('db_replica') if has_request_context() else None
+        if bind and not self._flushing and not isinstance(clause, UpdateBase):
+            return get_state(self.app).db.get_engine(self.app, bind=bind)
+        return super().get_bind(mapper, clause)
+
+
+class SQLAlchemy(BaseSQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+def replica_binds(app):
+    return [f'replica_{i}' for i in range(len(app.config.get('SQLALCHEMY_REPLICA_URIS') or []))]
+
+
+#------------------------------------------------------------------#
+# Replication lag / checked at most every REPLICA_LAG_CHECK_INTERVAL
+#------------------------------------------------------------------#
+# 0 when the replica has replayed everything it received (an idle primary
+# would otherwise look like growing lag), NULL when it is not a standby
+LAG_QUERY = text(
+    "SELECT COALESCE(CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END, 0)"
+)
+
+lag_lock = threading.Lock()
+lag_checks = {}
+
+
+def measure_lag(engine):
+    if engine.dialect.name != 'postgresql':
+        return 0.0
+    with engine.connect() as connection:
+        return float(connection.execute(LAG_QUERY).scalar() or 0)
+
+
+def replica_lag(bind):
+    interval = current_app.config.get('REPLICA_LAG_CHECK_INTERVAL', 5)
+    now = time.monotonic()
+    with lag_lock:
+        checked = lag_checks.get(bind)
+        if checked is not None and now - checked[0] < interval:
+            return checked[1]
+
+    # An unreachable replica counts as infinitely late until the next check
+    try:
+        lag = measure_lag(get_state(current_app).db.get_engine(current_app, bind=bind))
+    except Exception as error:
+        current_app.logger.warning('Replica %s unavailable: %s', bind, error)
+        lag = float('inf')
+
+    with lag_lock:
+        lag_checks[bind] = (now, lag)
+    return lag
+
+
+# Replica for this request / None to read from the primary
+def choose_replica():
+    binds = replica_binds(current_app)
+    if not binds:
+        return None
+
+    # Read your writes: the client wrote recently, replicas may be behind
+    try:
+        if float(request.cookies.get(STICKY_COOKIE, 0)) > time.time():
+            return None
+    except ValueError:
+        pass
+
+    max_lag = current_app.config.get('REPLICA_MAX_LAG', 5)
+    healthy = [bind for bind in binds if replica_lag(bind) <= max_lag]
+    return random.choice(healthy) if healthy else None
+
+
+#------------------------------------------------------------------#
+# View decorator and app setup
+#------------------------------------------------------------------#
+def read_only(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_read_only = True
+        g.db_replica = choose_replica()
+        return view(*args, **kwargs)
+    return wrapper
+
+
+# Note writes made while handling a request (the delete pages are GETs)
+@event.listens_for(RoutingSession, 'after_flush')
+def note_write(session, flush_context):
+    if has_request_context():
+        g.db_wrote = True
+
+
+# Keep the client on the primary for a while after any request that may
+# have written: it flushed, or used a non-safe method outside a read_only view
+def stick_to_primary(response):
+    may_write = request.method not in SAFE_METHODS and not g.get('db_read_only')
+    if not (may_write or g.get('db_wrote')):
+        return response
+    seconds = current_app.config.get('REPLICA_STICKY_SECONDS', 10)
+    if seconds and replica_binds(current_app):
+        response.set_cookie(STICKY_COOKIE, str(time.time() + seconds),
+          max_age=seconds, httponly=True, samesite='Lax')
+    return response
+
+
+# Call before db.init_app so the replica binds are registered
+def init_routing(app):
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    for bind, uri in zip(replica_binds(app), app.config.get('SQLALCHEMY_REPLICA_URIS') or []):
+        binds[bind] = uri
+    app.config['SQLALCHEMY_BINDS'] = binds
+    app.after_request(stick_to_primary)
@@ -21,4 +21,84 @@ SQLALCHEMY_DATABASE_URI = "postgresql://{}:{}@{}/{}".format(
 )
 
 # Reduce significant overhead
-SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Number of shows per page on the /shows listing
+SHOWS_PER_PAGE = 30
+SHOWS_MAX_PER_PAGE = 200
+
+# Search backend: 'postgres' (pg_trgm), 'ngram' (in-process index) or 'auto'
+SEARCH_BACKEND = 'auto'
+SEARCH_RESULT_LIMIT = 50
+
+# Raise on accidental lazy loads of relationships (N+1 guard)
+SQLALCHEMY_RAISELOAD = DEBUG
+
+# Cache of the artist and venue pages: 'lru' (in process), 'redis' or 'null'
+CACHE_BACKEND = 'lru'
+CACHE_DEFAULT_TTL = 300
+CACHE_MAX_ENTRIES = 1024
+CACHE_REDIS_URL = 'redis://localhost:6379/0'
+
+# Page size of the /api/v1 list endpoints
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 500
+# Serve whole-table dumps at /api/v1/export/<kind>.<format> to anyone who
+# can reach the app / keep off on a public site and use 'flask export'
+EXPORT_ENDPOINT = False
+
+# Templates: on-disk bytecode cache and compilation of every template at boot
+JINJA_BYTECODE_CACHE = not DEBUG
+JINJA_BYTECODE_CACHE_DIR = None
+TEMPLATE_PRECOMPILE = not DEBUG
+
+# Connection pool (Postgres) / per worker process: size the workers so that
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) stays under max_connections
+DB_POOL_SIZE = 5
+DB_MAX_OVERFLOW = 10
+DB_POOL_TIMEOUT = 30
+DB_POOL_RECYCLE = 1800
+DB_POOL_PRE_PING = True
+DB_STATEMENT_TIMEOUT = 5000  # ms, None to disable
+# Behind PgBouncer in transaction pooling mode: no app side pool, timeout
+# set per transaction
+DB_PGBOUNCER = False
+# Serve the pool stats of each worker at /api/v1/pool
+DB_POOL_STATS_ENDPOINT = False
+
+# Read replicas for the read-only pages and API endpoints (empty: primary only)
+SQLALCHEMY_REPLICA_URIS = []
+REPLICA_MAX_LAG = 5             # seconds; replicas further behind are skipped
+REPLICA_LAG_CHECK_INTERVAL = 5  # seconds between lag checks per worker
+REPLICA_STICKY_SECONDS = 10     # a client reads from the primary after writing
+
+# Default radius of the /venues/near search, in km
+VENUES_NEAR_RADIUS_KM = 25
+
+# Artist / venue recommendations
+MATCH_RESULT_LIMIT = 10
+MATCH_INDEX_MAX_AGE = 300  # seconds before a worker rebuilds its index
+
+# Home page feed: cached, rebuilt by a background thread per worker
+HOME_FEED_SIZE = 5
+HOME_FEED_REFRESH_SECONDS = 60  # 0: no thread, rebuilt on the next hit after a write
+HOME_TRENDING_DAYS = 7
+
+# Per-request SQL instrumentation (X-DB-Queries and Server-Timing headers)
+SQL_INSTRUMENTATION = True
+SQL_NPLUSONE_THRESHOLD = 5       # same statement this many times in a request
+SQL_NPLUSONE_ACTION = 'warn'     # 'warn', 'raise' (tests) or 'ignore'
+SQL_LOG_REQUESTS = False         # log every request, not only the N+1 ones
+SQL_STATS_ENDPOINT = False       # per endpoint totals at /api/v1/sql
+
+# Logging (DEBUG off): JSON lines written by a background thread per worker
+# One file shared by the workers, rotated by logrotate (None: stderr)
+LOG_FILE = 'error.log'
+# Or one file per worker, rotated by the app as set below
+# LOG_FILE = 'logs/error-{pid}.log'
+LOG_LEVEL = 'INFO'
+LOG_MAX_BYTES = 10 * 1024 * 1024  # size rotation (per worker files)
+LOG_ROTATE_WHEN = None           # 'midnight', 'H', ...: time rotation instead
+LOG_BACKUP_COUNT = 5
+LOG_QUEUE_SIZE = 10000           # records waiting to be written; more are dropped
+LOG_TRUST_REQUEST_ID = True      # reuse the X-Request-ID set by the proxy
@@ -0,0 +1,6 @@
+from search.backends import (
+    SearchEngine,
+    PostgresSearchBackend,
+    NgramSearchBackend,
+    search_engine
+)
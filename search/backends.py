@@ -0,0 +1,262 @@
+#------------------------------------------------------------------#
+# Imports
+#------------------------------------------------------------------#
+import heapq
+import re
+import threading
+from collections import Counter, defaultdict
+from itertools import chain, islice
+
+from flask import current_app
+from sqlalchemy import func, literal, or_
+
+# Import user defined module
+from models import db, has_genre, Artist, Venue
+from session_changes import subscribe_changes
+from form_validate.enums import Genre
+
+
+# Models that can be searched
+SEARCHABLE_MODELS = (Artist, Venue)
+
+# Minimum share of the search trigrams a row must contain (same as pg_trgm)
+SIMILARITY_THRESHOLD = 0.3
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+# Genre names (as stored in the genres column) matching a search term
+def matching_genres(term):
+    term = term.strip().lower()
+    if not term:
+        return []
+    return [genre.name for genre in Genre
+            if term in (genre.name.lower(), genre.value.lower())]
+
+
+# Escape LIKE wildcards typed by the user
+def like_pattern(term):
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+# Postgres backend / pg_trgm similarity backed by GIN trigram indexes
+#------------------------------------------------------------------#
+class PostgresSearchBackend:
+
+    def search(self, model, term, limit, genre=None):
+        location = model.city + literal(', ') + model.state
+        pattern = like_pattern(term)
+
+        conditions = [
+            model.name.ilike(pattern, escape='\\'),
+            model.name.op('%')(term),
+            location.ilike(pattern, escape='\\'),
+        ]
+        genres = matching_genres(term)
+        if genres:
+            conditions.append(model.genres.overlap(genres))
+
+        # Rank by the best trigram similarity of the name or the location
+        score = func.greatest(
+            func.similarity(model.name, term),
+            func.similarity(location, term)
+        )
+        query = db.session.query(model.id).filter(or_(*conditions))
+        if genre is not None:
+            query = query.filter(has_genre(model.genres, genre))
+        rows = query.order_by(score.desc(), model.id).limit(limit).all()
+        return [row.id for row in rows]
+
+    def warm(self):
+        pass
+
+    def invalidate(self, model=None):
+        pass
+
+
+# In-process n-gram inverted index / used on SQLite and in tests
+#------------------------------------------------------------------#
+def trigrams(text):
+    grams = set()
+    for word in WORD_PATTERN.findall((text or '').lower()):
+        padded = f'  {word} '
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class NgramIndex:
+
+    def __init__(self):
+        self.postings = defaultdict(set)
+        self.genres = defaultdict(set)
+        self.documents = {}
+
+    def add(self, doc_id, name, city, state, genres):
+        self.remove(doc_id)
+        text = f'{name or ""} {city or ""} {state or ""}'
+        grams = trigrams(text)
+        for gram in grams:
+            self.postings[gram].add(doc_id)
+        for genre in genres or ():
+            self.genres[genre].add(doc_id)
+        self.documents[doc_id] = (text.lower(), grams, tuple(genres or ()))
+
+    def remove(self, doc_id):
+        document = self.documents.pop(doc_id, None)
+        if document is None:
+            return
+        text, grams, genres = document
+        for gram in grams:
+            self.postings[gram].discard(doc_id)
+        for genre in genres:
+            self.genres[genre].discard(doc_id)
+
+    def search(self, term, limit, genre=None):
+        grams = trigrams(term)
+
+        # Count the term trigrams each row contains (counted in C by Counter)
+        counts = Counter(chain.from_iterable(
+            self.postings[gram] for gram in grams if gram in self.postings))
+
+        # Keep the rows of the genre before shortlisting
+        allowed = None
+        if genre is not None:
+            allowed = self.genres.get(genre, set())
+            counts = Counter({doc_id: count for doc_id, count in counts.items()
+                              if doc_id in allowed})
+
+        # Shortlist the rows sharing the most trigrams with the term, keeping
+        # those above the similarity threshold / genre matches always qualify
+        needed = max(1, int(len(grams) * SIMILARITY_THRESHOLD + 0.5))
+        ranked = {doc_id: count / len(grams)
+                  for doc_id, count in counts.most_common(limit * 4)
+                  if count >= needed}
+        for matched in matching_genres(term):
+            matches = self.genres.get(matched, set())
+            if allowed is not None:
+                matches = matches & allowed
+            for doc_id in islice(matches, limit * 4):
+                ranked.setdefault(doc_id, 0.5)
+
+        # Rank rows containing the exact term first
+        lowered = term.strip().lower()
+        for doc_id in ranked:
+            if lowered in self.documents[doc_id][0]:
+                ranked[doc_id] += 1
+        return sorted(ranked, key=lambda doc_id: (-ranked[doc_id], doc_id))[:limit]
+
+
+class NgramSearchBackend:
+
+    def __init__(self):
+        self.indexes = {}
+        self.lock = threading.Lock()
+
+    # Build the index of a model on first use
+    def index(self, model):
+        index = self.indexes.get(model)
+        if index is None:
+            with self.lock:
+                index = self.indexes.get(model)
+                if index is None:
+                    index = NgramIndex()
+                    rows = db.session.query(model.id, model.name, model.city,
+                      model.state, model.genres).yield_per(10000)
+                    for row in rows:
+                        index.add(row.id, row.name, row.city, row.state, row.genres)
+                    self.indexes[model] = index
+        return index
+
+    def search(self, model, term, limit, genre=None):
+        return self.index(model).search(term, limit, genre)
+
+    def warm(self):
+        for model in SEARCHABLE_MODELS:
+            self.index(model)
+
+    # Drop an index / it is rebuilt on the next search
+    def invalidate(self, model=None):
+        with self.lock:
+            if model is None:
+                self.indexes.clear()
+            else:
+                self.indexes.pop(model, None)
+
+    # Apply committed inserts, updates and deletes to built indexes
+    # Each change is (model, id, (name, city, state, genres) or None)
+    def apply(self, changes):
+        with self.lock:
+            for model, doc_id, values in changes:
+                index = self.indexes.get(model)
+                if index is None:
+                    continue
+                if values is None:
+                    index.remove(doc_id)
+                else:
+                    index.add(doc_id, *values)
+
+
+# Flask extension choosing the backend from the configuration
+#
+#   SEARCH_BACKEND = 'auto' | 'postgres' | 'ngram'
+#   SEARCH_RESULT_LIMIT = 50
+#------------------------------------------------------------------#
+class SearchEngine:
+
+    def __init__(self, app=None):
+        self.backends = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SEARCH_BACKEND', 'auto')
+        app.config.setdefault('SEARCH_RESULT_LIMIT', 50)
+        app.extensions['search_engine'] = self
+
+    @property
+    def backend(self):
+        app = current_app._get_current_object()
+        backend = self.backends.get(app)
+        if backend is None:
+            name = app.config['SEARCH_BACKEND']
+            if name == 'auto':
+                name = 'postgres' if db.engine.dialect.name == 'postgresql' else 'ngram'
+            backend = PostgresSearchBackend() if name == 'postgres' else NgramSearchBackend()
+            self.backends[app] = backend
+        return backend
+
+    # Ids of the best matching rows, most relevant first / only rows of
+    # the genre (a Genre name) when one is given
+    def search(self, model, term, limit=None, genre=None):
+        term = (term or '').strip()
+        if not term:
+            return []
+        limit = limit or current_app.config['SEARCH_RESULT_LIMIT']
+        return self.backend.search(model, term, limit, genre)
+
+    def warm(self):
+        self.backend.warm()
+
+    # Rows were written without the session (bulk import) / rebuild on next use
+    def invalidate(self, model=None):
+        self.backend.invalidate(model)
+
+
+search_engine = SearchEngine()
+
+
+# Keep the in-process indexes in step with committed changes
+#------------------------------------------------------------------#
+def search_values(instance):
+    return (instance.name, instance.city, instance.state, list(instance.genres or ()))
+
+
+def apply_search_changes(changes):
+    for backend in search_engine.backends.values():
+        if isinstance(backend, NgramSearchBackend):
+            backend.apply(changes)
+
+
+subscribe_changes(SEARCHABLE_MODELS, search_values, apply_search_changes)
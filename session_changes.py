@@ -0,0 +1,54 @@
+#------------------------------------------------------------------#
+# Imports
+#------------------------------------------------------------------#
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+#------------------------------------------------------------------#
+# Committed changes of artists and venues
+#
+# In-process indexes (search, matchmaking) stay in step with the rows
+# written through the session. Each one subscribes with the models it
+# indexes, a function copying the values it needs from a written
+# instance, and a function receiving the changes once they commit:
+#
+#   subscribe_changes((Artist, Venue), values, apply)
+#
+# apply gets a list of (model, id, values or None when deleted). The
+# values are copied at flush time: instances expire on commit and
+# cannot be loaded afterwards. Rolled back changes are dropped.
+#------------------------------------------------------------------#
+subscribers = []
+
+
+def subscribe_changes(models, values, apply):
+    subscribers.append((tuple(models), values, apply))
+
+
+@event.listens_for(Session, 'after_flush')
+def collect_changes(session, flush_context):
+    if not subscribers:
+        return
+    changes = session.info.setdefault('index_changes', {})
+    written, deleted = session.new | session.dirty, session.deleted
+    for position, (models, values, apply) in enumerate(subscribers):
+        for instance in written:
+            if isinstance(instance, models):
+                changes.setdefault(position, []).append(
+                  (type(instance), instance.id, values(instance)))
+        for instance in deleted:
+            if isinstance(instance, models):
+                changes.setdefault(position, []).append((type(instance), instance.id, None))
+
+
+@event.listens_for(Session, 'after_commit')
+def apply_changes(session):
+    changes = session.info.pop('index_changes', None)
+    for position, items in (changes or {}).items():
+        subscribers[position][2](items)
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_changes(session):
+    session.info.pop('index_changes', None)
@@ -9,16 +9,29 @@ from flask import (
     Response, 
     flash, 
     redirect, 
-    url_for
+    url_for,
+    abort,
+    current_app
 )
+from datetime import date, time, timedelta
+from itertools import groupby
 from sqlalchemy import desc
+from sqlalchemy.exc import IntegrityError
 from logging import Formatter, FileHandler
 from flask_wtf import FlaskForm
 import logging
 
 # Import model and forms module
 from models import *
+from counters import record_show
+from booking import find_conflict, describe_conflict
+from cache import invalidate_show
+from feed import invalidate_feed
+from pagination import after_cursor, decode_cursor, fetch_page, parse_limit
+from routing import read_only
+from facets import parse_genre
 from form_validate.forms import *
+from form_validate.enums import Genre
 
 
 # Create a show blueprint object
@@ -41,20 +54,57 @@ def create_show_submission():
     form = ShowForm(request.form)
     
     #Get data from form submitted
+    # The duration bounds the range scanned by the conflict checks
+    if not form.duration.validate(form):
+        flash('Show could not be listed. Duration must be between 1 and %d minutes.' % MAX_SHOW_DURATION)
+        return render_template('forms/new_show.html', form=form)
+
     try:
+        start_time = form.start_time.data
+        end_time = start_time + timedelta(minutes=form.duration.data or DEFAULT_SHOW_DURATION)
+
+        # Reject the show if its artist or venue is booked at that time
+        conflict = find_conflict(form.artist_id.data, form.venue_id.data, start_time, end_time)
+        if conflict is not None:
+            flash('Show could not be listed. ' +
+                  describe_conflict(conflict, form.artist_id.data, form.venue_id.data))
+            return render_template('forms/new_show.html', form=form)
+
         newShow = Show(
           artist_id = form.artist_id.data,
           venue_id = form.venue_id.data, 
-          start_time = form.start_time.data
+          start_time = start_time,
+          end_time = end_time
         )
 
         #Add new show object to the db session
         db.session.add(newShow)
+
+        # Count the show and refresh the artist and venue pages listing it
+        record_show(form.artist_id.data, form.venue_id.data, start_time)
+        touch(Artist, [form.artist_id.data])
+        touch(Venue, [form.venue_id.data])
         db.session.commit()
 
+        # Drop the cached pages of the artist and venue of the show, and
+        # refresh the trending sections of the home page
+        invalidate_show(form.artist_id.data, form.venue_id.data)
+        invalidate_feed()
+
         #If show is successfully added to database
         flash('Show was successfully listed!')
 
+    except IntegrityError:
+        # Booked concurrently / rejected by the Postgres exclusion constraints
+        error = True
+        db.session.rollback()
+        conflict = find_conflict(form.artist_id.data, form.venue_id.data, start_time, end_time)
+        if conflict is not None:
+            flash('Show could not be listed. ' +
+                  describe_conflict(conflict, form.artist_id.data, form.venue_id.data))
+        else:
+            flash('An error occured. Show could not be listed.')
+
     except:
         #Error handler
         error = True
@@ -73,34 +123,158 @@ def create_show_submission():
 
 # List all the shows created
 #-------------------------------------------------------------------------#
+
+# Read an optional date (YYYY-MM-DD or ISO datetime) from the query string
+def parse_window_date(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        abort(400)
+
+
+# Optional filters of the show listings / ?city=...&state=CA&genre=Jazz
+FILTER_ARGS = ('city', 'state', 'genre')
+
+
+# Shows whose venue is in a city / state, or whose artist plays a genre
+def filter_shows(query):
+    city = request.args.get('city')
+    state = request.args.get('state')
+    genre = request.args.get('genre')
+    if city:
+        query = query.filter(Venue.city == city)
+    if state:
+        query = query.filter(Venue.state == state)
+    if genre:
+        query = query.filter(has_genre(Artist.genres, parse_genre(genre)))
+    return query
+
+
+# Query string of the listing to carry over to the next page
+def page_args():
+    return {name: request.args.get(name) for name in ('start', 'end', 'limit') + FILTER_ARGS}
+
+
+# One page of shows joined with their artist and venue in start_time order
+# Reads the start / end window (start and end are used when missing), the
+# filters and the cursor from the query string
+def shows_page(limit, start=None, end=None):
+
+    window_start = parse_window_date('start') or start
+    window_end = parse_window_date('end') or end
+
+    # Join the show, artist and venue in one query / fetch only the rendered columns
+    query = db.session.query(
+        Show.id,
+        Show.artist_id,
+        Show.venue_id,
+        Show.start_time,
+        Show.end_time,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+        Venue.name.label('venue_name'),
+        Venue.city.label('venue_city'),
+        Venue.state.label('venue_state')
+      ).join(Artist, Show.artist_id == Artist.id)\
+      .join(Venue, Show.venue_id == Venue.id)\
+      .order_by(Show.start_time, Show.id)
+
+    # Optional date window
+    if window_start is not None:
+        query = query.filter(Show.start_time >= window_start)
+    if window_end is not None:
+        query = query.filter(Show.start_time < window_end)
+    query = filter_shows(query)
+
+    # Continue after the last show of the previous page
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            query = after_cursor(query, (Show.start_time, Show.id),
+              decode_cursor(cursor, datetime, int))
+        except ValueError:
+            abort(400)
+
+    return fetch_page(query, limit, lambda show: (show.start_time, show.id))
+
+
 @show_bp.route('/shows')
+@read_only
 def shows():
 
     data = []
 
-    # Get the list of all venues
-    venues = Venue.query.all()
+    limit = parse_limit(request.args.get('limit'),
+      current_app.config.get('SHOWS_PER_PAGE', 30),
+      current_app.config.get('SHOWS_MAX_PER_PAGE', 200))
+    show_records, next_cursor = shows_page(limit)
 
-    # For every venue get artist and show details
-    for venue in venues:
+    for show in show_records:
 
-        # Get the shows in this venue
-        show_records = Show.query.filter(Show.venue_id==venue.id).all()
+        # Append show details to the data list
+        data.append({
+          "artist_id": show.artist_id,
+          "artist_name": show.artist_name,
+          "venue_id": show.venue_id,
+          "venue_name": show.venue_name,
+          "artist_image_link": show.artist_image_link,
+          "start_time": show.start_time
+        })
 
-        for show in show_records:
+    # Link to the next page keeping the same window, filters and page size
+    next_url = None
+    if next_cursor:
+        next_url = url_for('show_bp.shows', cursor=next_cursor, **page_args())
+
+    #Redirect user to the shows page
+    return render_template('pages/shows.html', shows=data, next_url=next_url)
 
-            # Get the artist object / every show has a performing artist
-            artist = Artist.query.get(show.artist_id)
 
-            # Append show details to the data list
-            data.append({
+# Calendar of shows / one month from today unless start and end are given,
+# grouped by day
+#-------------------------------------------------------------------------#
+CALENDAR_DAYS = 31
+
+
+@show_bp.route('/shows/calendar')
+@read_only
+def calendar():
+
+    today = datetime.combine(date.today(), time())
+    window_start = parse_window_date('start') or today
+    window_end = parse_window_date('end') or window_start + timedelta(days=CALENDAR_DAYS)
+
+    limit = parse_limit(request.args.get('limit'),
+      current_app.config.get('SHOWS_PER_PAGE', 30),
+      current_app.config.get('SHOWS_MAX_PER_PAGE', 200))
+    show_records, next_cursor = shows_page(limit, window_start, window_end)
+
+    # Rows come in start_time order / group them by day
+    days = []
+    for day, day_shows in groupby(show_records, key=lambda show: show.start_time.date()):
+        days.append({
+          "date": day,
+          "shows": [{
             "artist_id": show.artist_id,
-            "artist_name": artist.name,
+            "artist_name": show.artist_name,
             "venue_id": show.venue_id,
-            "venue_name": venue.name,
-            "artist_image_link": artist.image_link,
-            "start_time": show.start_time.strftime("%m/%d/%y, %H:%M")
-            })
+            "venue_name": show.venue_name,
+            "venue_city": show.venue_city,
+            "venue_state": show.venue_state,
+            "start_time": show.start_time,
+            "end_time": show.end_time
+          } for show in day_shows]
+        })
 
-    #Redirect user to the shows page
-    return render_template('pages/shows.html', shows=data)
+    next_url = None
+    if next_cursor:
+        args = page_args()
+        args.update(start=window_start.isoformat(), end=window_end.isoformat())
+        next_url = url_for('show_bp.calendar', cursor=next_cursor, **args)
+
+    return render_template('pages/calendar.html', days=days, next_url=next_url,
+      window_start=window_start, window_end=window_end, genres=Genre.choices(),
+      filters={name: request.args.get(name, '') for name in FILTER_ARGS})
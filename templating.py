@@ -0,0 +1,87 @@
+#------------------------------------------------------------------#
+# Imports
+#------------------------------------------------------------------#
+import os
+import tempfile
+from datetime import datetime
+from functools import lru_cache
+
+from jinja2 import FileSystemBytecodeCache
+
+
+#------------------------------------------------------------------#
+# Date filter
+#
+# Views pass datetime objects (or the '%Y-%m-%d %H:%M:%S' strings kept
+# in the cached page data). Babel patterns and the locale are parsed
+# once, and formatted values are memoized since many shows share the
+# same start time.
+#------------------------------------------------------------------#
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@lru_cache(maxsize=None)
+def compiled_pattern(format):
+    from babel.dates import parse_pattern
+    return parse_pattern(FORMATS.get(format, format))
+
+
+@lru_cache(maxsize=None)
+def locale(name):
+    from babel import Locale
+    return Locale.parse(name)
+
+
+def to_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        import dateutil.parser
+        return dateutil.parser.parse(value)
+
+
+@lru_cache(maxsize=8192)
+def format_cached(value, format):
+    return compiled_pattern(format).apply(value, locale('en'))
+
+
+def format_datetime(value, format='medium'):
+    return format_cached(to_datetime(value), format)
+
+
+#------------------------------------------------------------------#
+# Template setup
+#
+#   JINJA_BYTECODE_CACHE = True        cache compiled templates on disk
+#   JINJA_BYTECODE_CACHE_DIR = None    defaults to a folder in the temp dir
+#   TEMPLATE_PRECOMPILE = True         compile every template at boot
+#------------------------------------------------------------------#
+def init_templates(app):
+    app.config.setdefault('JINJA_BYTECODE_CACHE', not app.debug)
+    app.config.setdefault('JINJA_BYTECODE_CACHE_DIR', None)
+    app.config.setdefault('TEMPLATE_PRECOMPILE', not app.debug)
+
+    app.jinja_env.filters['datetime'] = format_datetime
+
+    if app.config['JINJA_BYTECODE_CACHE']:
+        directory = app.config['JINJA_BYTECODE_CACHE_DIR'] or os.path.join(
+            tempfile.gettempdir(), 'fyyur-jinja-cache')
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+
+    if app.config['TEMPLATE_PRECOMPILE']:
+        precompile_templates(app)
+
+
+# Load every page template of the app and the blueprints so the first
+# request of a worker does not pay for parsing and compiling them
+def precompile_templates(app):
+    names = [name for name in app.jinja_env.list_templates() if name.endswith('.html')]
+    for name in names:
+        app.jinja_env.get_template(name)
+    return names
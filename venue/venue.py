@@ -9,9 +9,12 @@ from flask import (
     Response, 
     flash, 
     redirect, 
-    url_for
+    url_for,
+    abort,
+    current_app
 )
 from sqlalchemy import desc
+from itertools import groupby
 from logging import Formatter, FileHandler
 from flask_wtf import FlaskForm
 import logging
@@ -19,6 +22,16 @@ import logging
 # Import model and forms module
 from models import *
 from form_validate.forms import *
+from search import search_engine
+from conditional import Validators
+from geo import geocode, nearest_venues, venues_within
+from pagination import parse_limit
+from routing import read_only
+from facets import requested_genre, filter_genre, listing_version, genre_facets
+from matchmaking import recommendations
+from feed import invalidate_feed
+from counters import forget_shows
+from cache import cache, venue_key, details_ttl, invalidate_venue, artists_of_venue
 
 # Create a venue blueprint object
 venue_bp = Blueprint('venue_bp', __name__, template_folder='templates')
@@ -58,6 +71,9 @@ def create_venue_submission():
         db.session.add(newVenue)
         db.session.commit()
 
+        # The home page lists the newest venues
+        invalidate_feed()
+
         # on successful db insert, flash success
         flash('Venue ' + request.form['name'] + ' was successfully listed!')
         
@@ -79,70 +95,74 @@ def create_venue_submission():
 # List all the venues created
 #------------------------------------------------------------------------#
 @venue_bp.route('/venues')
+@read_only
 def venues():
 
     data=[]
-    
-    # Get a record of the distinct city and state that define the places where the venues are located
-    places = Venue.query.distinct(Venue.city, Venue.state).all()
-    
-    #Loop through every place with venues
-    for place in places:
-
-        venue_details = []
-        
-        # Get all venues in that specific city and state
-        venues = Venue.query.filter(Venue.city.like(place.city))\
-        .filter(Venue.state.like(place.state)).all()
-        
-        # Loop through every venue in that city and state
-        for venue in venues:
-
-          # Add venue record to the empty venue_details list
-          venue_details.append({'id':venue.id, 'name':venue.name})
-                
-        #add each city to the data list
-        data.append({'city':place.city, 'state':place.state, 'venues':venue_details})
+    genre = requested_genre()
+
+    # Answer with 304 when the list has not changed since the client's copy
+    version = listing_version(Venue)
+    last_update, count = version
+    validators = Validators(('venues', genre, last_update, count), last_update)
+    if validators.fresh:
+        return validators.not_modified()
+
+    # Fetch only the columns the page renders in a single ordered query, so
+    # venues located in the same city and state arrive next to each other
+    query = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state,
+        Venue.upcoming_shows_count)
+    rows = filter_genre(query, Venue, genre)\
+      .order_by(Venue.city, Venue.state, Venue.name, Venue.id).all()
+
+    # Group consecutive rows by place in one pass over the result
+    for (city, state), venues in groupby(rows, key=lambda row: (row.city, row.state)):
+
+        # Add the venues of this city and state to the data list
+        data.append({
+          'city': city,
+          'state': state,
+          'venues': [{
+            'id': venue.id,
+            'name': venue.name,
+            'num_upcoming_shows': venue.upcoming_shows_count
+          } for venue in venues]
+        })
 
     # Redirect to venues page            
-    return render_template('pages/venues.html', areas=data)
+    return validators.apply(render_template('pages/venues.html', areas=data,
+      facets=genre_facets(Venue, version, genre)))
 
 
 # Show the details of the selected venue
 #-----------------------------------------------------------------------#
-@venue_bp.route('/venues/<int:venue_id>')
-def show_venue(venue_id):
+# Assemble the data of the venue page / aborts with 404 if not found
+def venue_details(venue_id):
 
     data = {}
     
     # Get venue object using (venue_id) / return an error if not found
-    venue = Venue.query.get_or_404(venue_id)
+    venue = Venue.query.options(*strict_loading()).get_or_404(venue_id)
 
-    # Get details of past shows for the selected venue
-    past_shows_query = db.session.query(Show).join(Artist).filter(Show.venue_id==venue_id)\
-      .filter(Show.start_time < datetime.now()).all()
+    # Get details of all the shows with their artist in one query
+    shows_query = db.session.query(Show.artist_id, Show.start_time,
+        Artist.name.label('artist_name'), Artist.image_link.label('artist_image_link'))\
+      .join(Artist, Show.artist_id == Artist.id).filter(Show.venue_id==venue_id)\
+      .order_by(Show.start_time).all()
     past_shows = []
-
-    for show in past_shows_query:
-      past_shows.append({
-        "artist_id": show.artist_id,
-        "artist_name": show.artist.name,
-        "artist_image_link": show.artist.image_link,
-        "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-      })
-    
-    # Get details of upcoming shows for the selected venue
-    upcoming_shows_query = db.session.query(Show).filter(Show.venue_id==venue_id)\
-      .filter(Show.start_time > datetime.now()).all()
     upcoming_shows = []
 
-    for show in upcoming_shows_query:
-      upcoming_shows.append({
+    # Split the shows into past and upcoming shows
+    now = datetime.now()
+    for show in shows_query:
+      if show.start_time == now:
+        continue
+      (past_shows if show.start_time < now else upcoming_shows).append({
         "artist_id": show.artist_id,
-        "artist_name": show.artist.name,
-        "artist_image_link": show.artist.image_link,
-        "start_time": show.start_time.strftime("%Y-%m-%d %H:%M:%S")    
-    })
+        "artist_name": show.artist_name,
+        "artist_image_link": show.artist_image_link,
+        "start_time": show.start_time.strftime("%Y-%m-%d %H:%M:%S")
+      })
 
     # Add data to dictionary
     data = {
@@ -164,25 +184,128 @@ def show_venue(venue_id):
         'upcoming_shows_count': len(upcoming_shows),
     }
 
+    return data
+
+
+# Version of the venue page / last write and start of the latest past show
+def venue_version(venue_id):
+
+    last_past_show = db.session.query(db.func.max(Show.start_time))\
+      .filter(Show.venue_id == Venue.id, Show.start_time < datetime.now()).scalar_subquery()
+    version = db.session.query(Venue.updated_at, last_past_show)\
+      .filter(Venue.id == venue_id).first()
+    if version is None:
+        abort(404)
+    return version
+
+
+@venue_bp.route('/venues/<int:venue_id>')
+@read_only
+def show_venue(venue_id):
+
+    # Answer with 304 before loading anything when the client's copy is current
+    updated_at, last_past_show = venue_version(venue_id)
+    validators = Validators(('venue', venue_id, updated_at, last_past_show), updated_at)
+    if validators.fresh:
+        return validators.not_modified()
+
+    # Serve the assembled page data from the cache when possible
+    data = cache.get(venue_key(venue_id))
+    if data is None:
+        data = venue_details(venue_id)
+        cache.set(venue_key(venue_id), data, details_ttl(data))
+
     #Redirect to the show_venue page
-    return render_template('pages/show_venue.html', venue=data)
+    return validators.apply(render_template('pages/show_venue.html', venue=data))
+
+
+# Artists recommended to the venue
+#------------------------------------------------------------------------#
+@venue_bp.route('/venues/<int:venue_id>/recommendations')
+@read_only
+def venue_recommendations(venue_id):
+    venue = Venue.query.options(*strict_loading()).get_or_404(venue_id)
+    return render_template('pages/recommended_artists.html', venue=venue,
+      artists=recommendations(venue))
+
+
+# Venues near a point
+#------------------------------------------------------------------------#
+
+# Center and radius from ?lat=..&lon=.. or ?city=..&state=.. and ?radius=km
+# Returns (latitude, longitude, radius or None) / (None, None, None) when no
+# center was given; aborts with 400 on out of range values
+def near_args():
+    radius = request.args.get('radius', type=float)
+    latitude = request.args.get('lat', type=float)
+    longitude = request.args.get('lon', type=float)
+    if radius is not None and not 0 < radius <= 20000:
+        abort(400)
+
+    if latitude is None or longitude is None:
+        city, state = request.args.get('city'), request.args.get('state')
+        if not (city and state):
+            return None, None, None
+        place = geocode(db.session.connection(), city, state)
+        if place is None:
+            abort(404)
+        latitude, longitude = place
+
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        abort(400)
+    return latitude, longitude, radius
+
+
+# Venues within radius km, or the nearest ones when no radius is given
+def near_results(latitude, longitude, radius, limit):
+    if radius is not None:
+        return venues_within(latitude, longitude, radius, limit)
+    return nearest_venues(latitude, longitude, limit)
+
+
+@venue_bp.route('/venues/near')
+@read_only
+def venues_near():
+
+    latitude, longitude, radius = near_args()
+    data = []
+    if latitude is not None:
+        limit = parse_limit(request.args.get('limit'), 20, 100)
+        radius = radius or current_app.config.get('VENUES_NEAR_RADIUS_KM', 25)
+        for distance, venue in near_results(latitude, longitude, radius, limit):
+            data.append({'id': venue.id, 'name': venue.name, 'city': venue.city,
+                'state': venue.state, 'address': venue.address,
+                'distance': round(distance, 1), 'num_upcoming_shows': venue.upcoming_shows_count})
+
+    return render_template('pages/venues_near.html', venues=data,
+        latitude=latitude, longitude=longitude, radius=radius)
 
 
 # Search venues
 # -------------------------------------------------------------------------#
 @venue_bp.route('/venues/search', methods=['POST'])
+@read_only
 def search_venues():
 
     search_word = request.form['search_term']
+    genre = requested_genre()
 
-    results = Venue.query.filter(Venue.name.ilike(f'%{search_word}%')).all()
+    # Ranked ids of the best matching venues (name, city, state or genre)
+    ranked_ids = search_engine.search(Venue, search_word, genre=genre)
+
+    # Load the matches with their show counter in one query / keep the ranking order
+    rows = db.session.query(Venue.id, Venue.name, Venue.upcoming_shows_count)\
+      .filter(Venue.id.in_(ranked_ids)).all()
+    matches = {row.id: row for row in rows}
+    results = [matches[venue_id] for venue_id in ranked_ids if venue_id in matches]
 
     data = []
 
     for result in results:
 
         # Add the result to the data list
-        data.append({'id': result.id, 'name': result.name})
+        data.append({'id': result.id, 'name': result.name,
+          'num_upcoming_shows': result.upcoming_shows_count})
 
     # Create response to display with search results
     response = {
@@ -192,7 +315,8 @@ def search_venues():
     
     # Redirect to search_venues page
     return render_template('pages/search_venues.html', 
-      results=response, search_term=request.form.get('search_term', ''))
+      results=response, search_term=request.form.get('search_term', ''),
+      facets=genre_facets(Venue, listing_version(Venue), genre))
 
 
 # Update venue details
@@ -203,7 +327,7 @@ def edit_venue(venue_id):
   form = VenueForm()
 
   # Get the selected venue object to update or return error message
-  venue = Venue.query.get_or_404(venue_id)
+  venue = Venue.query.options(*strict_loading()).get_or_404(venue_id)
   
   # Redirect to the edit_venue page
   return render_template('forms/edit_venue.html', form=form, venue=venue)
@@ -232,8 +356,15 @@ def edit_venue_submission(venue_id):
     venue.seeking_talent = form.seeking_talent.data
     venue.seeking_description = form.seeking_description.data
 
+    # Artist pages list the venue too
+    artist_ids = artists_of_venue(venue_id)
+    touch(Artist, artist_ids)
     db.session.commit()
 
+    # Drop the cached pages showing this venue
+    invalidate_venue(venue_id, artist_ids)
+    invalidate_feed()
+
     # Flash success message
     flash('Venue ' + request.form['name'] + ' has been updated')
 
@@ -257,11 +388,22 @@ def delete_venue(venue_id):
   # Get the venue object to be deleted
   venue = Venue.query.get_or_404(venue_id)
 
+  # Artists whose pages list this venue
+  artist_ids = artists_of_venue(venue.id)
+
   try:
+    # Remove the venue's shows from the artist counters
+    forget_shows(Show.venue_id == venue.id)
+
     #Add venue object to db.session. 
     db.session.delete(venue) 
+    touch(Artist, artist_ids)
     db.session.commit()
 
+    # Drop the cached pages showing this venue
+    invalidate_venue(venue.id, artist_ids)
+    invalidate_feed()
+
     #display success message
     flash('Venue ' + venue.name + ' deleted successfully!')
 